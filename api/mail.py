@@ -0,0 +1,144 @@
+"""Asynchronous mails delivery"""
+import asyncio
+import concurrent.futures
+import random
+import smtplib
+import ssl
+import typing
+from email.message import Message
+
+from loguru import logger
+
+
+class SMTPTransport:
+    """Blocking smtp transport keeping authenticated connection open between mails"""
+
+    def __init__(self, host: str, port: int, use_ssl: bool, username: str, password: str, timeout: int):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._connection: typing.Optional[smtplib.SMTP] = None
+
+    def send(self, message: Message):
+        """Send mail reconnecting once if server has closed idle connection"""
+        try:
+            self._get_connection().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            self._get_connection().send_message(message)
+
+    def close(self):
+        if self._connection is None:
+            return
+        connection, self._connection = self._connection, None
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+    def _get_connection(self) -> smtplib.SMTP:
+        if self._connection is None:
+            if self.use_ssl:
+                connection = smtplib.SMTP_SSL(
+                    self.host,
+                    self.port,
+                    context=ssl.create_default_context(),
+                    timeout=self.timeout,
+                )
+            else:
+                connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.password:
+                connection.login(self.username, self.password)
+            self._connection = connection
+        return self._connection
+
+
+class MemoryTransport:
+    """Local smtp stand-in keeping sent mails in memory, for tests and development"""
+
+    def __init__(self):
+        self.sent_messages: list[Message] = []
+
+    def send(self, message: Message):
+        self.sent_messages.append(message)
+        logger.debug(f'Mail to {message["To"]} is kept in memory: {message.get_payload()}')
+
+    def close(self):
+        pass
+
+
+class Mailer:
+    """Queue of outgoing mails delivered in background with retries"""
+
+    def __init__(
+            self,
+            transport: typing.Union[SMTPTransport, MemoryTransport],
+            queue_size: int,
+            max_attempts: int,
+            retry_delay: float,
+            shutdown_timeout: float,
+    ):
+        self.transport = transport
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.shutdown_timeout = shutdown_timeout
+        self._queue: typing.Optional[asyncio.Queue] = None
+        self._task: typing.Optional[asyncio.Task] = None
+        # Transport is blocking so it works in one own thread which owns its connection
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, 'mail_worker')
+
+    def start(self):
+        """Start mails delivering in background"""
+        self._queue = asyncio.Queue(self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Deliver queued mails if it's possible in shutdown timeout and close connection"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f'{self._queue.qsize()} mails were not delivered before shutdown')
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.transport.close)
+
+    def send(self, message: Message):
+        """Queue mail to deliver, raise asyncio.QueueFull if there are too many undelivered mails"""
+        self._queue.put_nowait(message)
+
+    async def _run(self):
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._deliver(message)
+            except Exception as error:
+                logger.exception(f'Mail delivery to {message["To"]} failed unexpectedly: {error!r}')
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, message: Message):
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await loop.run_in_executor(self._executor, self.transport.send, message)
+                logger.debug(f'Mail is delivered to {message["To"]}')
+                return
+            except smtplib.SMTPRecipientsRefused as error:
+                logger.warning(f'Mail recipient {message["To"]} is refused: {error}')
+                return
+            except (smtplib.SMTPException, OSError) as error:
+                logger.warning(f'Mail delivery to {message["To"]} failed, attempt {attempt}: {error!r}')
+                await loop.run_in_executor(self._executor, self.transport.close)
+            if attempt < self.max_attempts:
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        logger.error(f'Mail to {message["To"]} is dropped after {self.max_attempts} attempts')
@@ -1,27 +1,50 @@
+import asyncio
+
 import ujson
 from aiohttp import web
-from aiohttp_session import setup, get_session
+from aiohttp_session import setup, get_session, new_session
 from loguru import logger
 
-from api.utilities import (
+from api.services import (
     register_user,
     login_user,
+    confirm_email,
     get_random_fact_info,
-    create_redis_storage,
+    get_random_facts_info,
     get_random_rated_fact_info,
     process_rating,
+    password_executor,
+    mailer,
+)
+from api.utilities import (
+    get_amount_of_random_facts,
+    create_redis_storage,
+    create_redis_connection,
     check_for_required_info_for_login,
     check_for_required_info_for_registration,
     check_for_required_info_to_rate_title,
     create_json_response,
     login_required,
     json_required,
-    process_email_confirmation
+    refresh_titles_ids_index_periodically,
 )
-from database.models import connect_to_db, db
+from api.rating_buffer import rating_buffer
+from database.models import connect_to_db, db, Title
 from database.utilities import apply_migrations
-from shared.exceptions import PasswordError, LoginError, EmailError
+from shared.exceptions import (
+    PasswordError,
+    LoginError,
+    EmailError,
+    IncorrectDataError,
+    ServiceUnavailableError,
+)
+from shared.constants import TitlesIndexSettings
 from shared.project_settings import settings
+from wiki_searcher.cache import extract_cache
+from wiki_searcher.fact_pool import fact_pool
+from wiki_searcher.prefetcher import extract_prefetcher
+from wiki_searcher.searcher import WikiSearcher
+from wiki_searcher.utilities import search_flights, upstream_governor, circuit_breaker
 
 
 @json_required
@@ -30,13 +53,15 @@ async def register(request: web.Request) -> web.Response:
     check_for_required_info_for_registration(data)
     logger.debug(f'User: {data["username"]} is trying to register')
     try:
-        response = await register_user(data, request)
+        response = await register_user(data, await new_session(request))
         logger.debug(f'Successful registration by user: {data["username"]}')
         return create_json_response(response)
     except (LoginError, PasswordError, EmailError) as error:
         response = {'error': str(error)}
         logger.debug(f'Registration error: {error}, user: {data["username"]}')
         return create_json_response(response)
+    except ServiceUnavailableError as error:
+        raise web.HTTPServiceUnavailable(text=str(error))
 
 
 @json_required
@@ -45,7 +70,7 @@ async def login(request: web.Request) -> web.Response:
     check_for_required_info_for_login(data)
     logger.debug(f'Authorization attempt by user:{data["username"]}')
     try:
-        response = await login_user(data, request)
+        response = await login_user(data, await new_session(request))  # New session is saved only on success
         logger.debug(f'Successful authorization by user:{data["username"]}')
         return create_json_response(response)
     except LoginError as error:
@@ -58,7 +83,14 @@ async def login(request: web.Request) -> web.Response:
 async def get_random_fact(request: web.Request) -> web.Response:
     session = await get_session(request)
     logger.debug(f'User:{session["username"]}, session id:{session.identity} asked for random info')
-    object_description = await get_random_fact_info()
+    amount = get_amount_of_random_facts(request)
+    try:
+        if amount is not None:
+            return create_json_response({'random_facts': await get_random_facts_info(amount)})
+        object_description = await get_random_fact_info()
+    except ServiceUnavailableError as error:
+        logger.warning(f'Random fact for user:{session["username"]} is unavailable: {error}')
+        raise web.HTTPServiceUnavailable(text=str(error))
     response = {'random_fact': object_description}
     return create_json_response(response)
 
@@ -68,8 +100,14 @@ async def get_random_rated_fact(request: web.Request) -> web.Response:
     search_type = request.match_info['search_type']
     session = await get_session(request)
     logger.debug(f'User:{session["username"]} session_id:{session.identity} asked for random rated fact')
-    object_description, title_name = await get_random_rated_fact_info(session, search_type)
-    response = {'random_rated_fact': object_description, 'title_name': title_name}
+    try:
+        object_description, title_name, title_id = await get_random_rated_fact_info(session, search_type)
+    except IncorrectDataError as error:
+        raise web.HTTPBadRequest(text=error.error_message)
+    except ServiceUnavailableError as error:
+        logger.warning(f'Random rated fact for user:{session["username"]} is unavailable: {error}')
+        raise web.HTTPServiceUnavailable(text=str(error))
+    response = {'random_rated_fact': object_description, 'title_name': title_name, 'title_id': title_id}
     return create_json_response(response)
 
 
@@ -79,32 +117,82 @@ async def rate_fact(request: web.Request) -> web.Response:
     data = await request.json(loads=ujson.loads)
     check_for_required_info_to_rate_title(data)
     session = await get_session(request)
-    username, rate_command, response = await process_rating(data, session)
+    try:
+        username, rate_command, response = await process_rating(data, session)
+    except IncorrectDataError as error:
+        raise web.HTTPBadRequest(text=error.error_message)
     logger.debug(f'User: {session["username"]}, session_id:{session.identity} has proceed command: {rate_command}')
     return create_json_response(response)
 
 
 async def email_confirmation(request: web.Request):
     """Process email confirmation"""
-    return create_json_response(await process_email_confirmation(request))
+    session = await get_session(request)
+    try:
+        return create_json_response(await confirm_email(request.match_info['token'], session))
+    except IncorrectDataError as error:
+        raise web.HTTPBadRequest(text=error.error_message)
 
 
 async def web_app() -> 'web.Application':
     """Start app entrypoint"""
     logger.info('Starting app web app')
     app = web.Application(debug=settings.debug_status)
-    storage = await create_redis_storage()
+    app['redis'] = await create_redis_connection()
+    storage = await create_redis_storage(app['redis'])
+    extract_cache.set_redis(app['redis'])
     add_handlers(app)
     setup(app, storage)
+    if settings.bot_webhook_in_api:
+        from bot.webhook import setup_webhook  # Bot is imported only when it works inside api app
+        setup_webhook(app)  # Its cleanup goes first to process accepted updates while api is still working
     app.on_cleanup.append(on_cleanup)
     await connect_to_db(settings.create_db_uri())
     apply_migrations(settings)
+    logger.info(f'Loaded {await Title.refresh_titles_ids_index()} titles into titles ids index')
+    app['titles_index_refreshing'] = asyncio.create_task(
+        refresh_titles_ids_index_periodically(
+            TitlesIndexSettings.REFRESH_PERIOD.value,
+            TitlesIndexSettings.FULL_RELOAD_PERIOD.value,
+        )
+    )
+    password_executor.start()
+    mailer.start()
+    if settings.rating_write_behind:
+        await rating_buffer.start(app['redis'])
+    await WikiSearcher.start_session()
+    extract_prefetcher.start()
+    await fact_pool.start()
     logger.info('Finishing starting process')
     return app
 
 
 async def on_cleanup(app: web.Application):
-    """Closing connection to db"""
+    """Closing connection to db, redis and wiki http session"""
+    logger.info(f'Stopping facts pool refilling, stats: {fact_pool.get_stats()}')
+    await fact_pool.stop()
+    logger.info('Stopping extracts prefetching')
+    await extract_prefetcher.stop()
+    app['titles_index_refreshing'].cancel()
+    try:
+        await app['titles_index_refreshing']
+    except asyncio.CancelledError:
+        pass
+    logger.info('Closing wiki http session')
+    await WikiSearcher.close_session()
+    logger.info(f'Extract cache stats: {extract_cache.get_stats()}')
+    logger.info(f'Wiki requests coalescing stats: {search_flights.get_stats()}')
+    logger.info(f'Wiki requests throttling stats: {upstream_governor.get_stats()}')
+    logger.info(f'Wiki requests circuit breaker stats: {circuit_breaker.get_stats()}')
+    logger.info('Flushing buffered rates')
+    await rating_buffer.stop()
+    logger.info(f'Password executor stats: {password_executor.get_stats()}')
+    await password_executor.stop()
+    logger.info('Delivering queued mails')
+    await mailer.stop()
+    extract_cache.set_redis(None)
+    app['redis'].close()
+    await app['redis'].wait_closed()
     logger.info('Closing db connection')
     await db.pop_bind().close()
     logger.info('Shutting down web app')
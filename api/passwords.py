@@ -0,0 +1,83 @@
+"""Password hashing off the event loop"""
+import asyncio
+import concurrent.futures
+import typing
+
+import bcrypt
+
+from shared.constants import PasswordExecutorType
+
+
+def hash_password(password: str) -> str:
+    """Hash password with salt"""
+    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return hashed_password.decode('utf-8')
+
+
+def check_password(password: str, hashed_password: str) -> bool:
+    """Check password against its hash"""
+    return bcrypt.checkpw(password.encode('utf-8'), bytes(hashed_password, encoding='utf8'))
+
+
+class PasswordExecutor:
+    """Executor running bcrypt work in thread or process pool with bounded concurrency"""
+
+    def __init__(self, executor_type: str, max_workers: int):
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.queue_depth = 0  # Calls waiting for free worker
+        self.max_queue_depth = 0
+        self.in_progress = 0
+        self.completed = 0
+        self._executor: typing.Optional[concurrent.futures.Executor] = None
+        self._semaphore: typing.Optional[asyncio.Semaphore] = None
+
+    def start(self):
+        """Create workers pool, calls are processed inline in event loop before start"""
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+        if self.executor_type == PasswordExecutorType.THREAD.value:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, 'password_worker')
+        elif self.executor_type == PasswordExecutorType.PROCESS.value:
+            self._executor = concurrent.futures.ProcessPoolExecutor(self.max_workers)
+        elif self.executor_type != PasswordExecutorType.INLINE.value:
+            raise ValueError(f'Unknown password executor type: {self.executor_type}')
+
+    async def stop(self):
+        """Shutdown workers pool"""
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+    async def hash_password(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def check_password(self, password: str, hashed_password: str) -> bool:
+        return await self._run(check_password, password, hashed_password)
+
+    def get_stats(self) -> dict[str, typing.Union[str, int]]:
+        """Get executor load metrics"""
+        return {
+            'executor_type': self.executor_type,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'in_progress': self.in_progress,
+            'completed': self.completed,
+        }
+
+    async def _run(self, function: typing.Callable, *args: typing.Any) -> typing.Any:
+        if self._executor is None:
+            return function(*args)
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+        self.in_progress += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        finally:
+            self.in_progress -= 1
+            self.completed += 1
+            self._semaphore.release()
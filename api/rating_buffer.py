@@ -0,0 +1,201 @@
+import asyncio
+import typing
+
+import aioredis
+import ujson
+from aioredis import Redis
+from asyncpg.exceptions import DataError, IntegrityConstraintViolationError
+from loguru import logger
+
+from database.models import Title
+from shared.constants import RatingBufferSettings
+
+REJECTED_RATE_ERRORS = (DataError, IntegrityConstraintViolationError)  # Retrying rate with them won't help
+
+
+class RatingBuffer:
+    """Write-behind buffer coalescing rates per title and per user category and flushing them in batches"""
+
+    def __init__(self, flush_interval: float, max_amount_of_events: int, redis_key: str, rejected_redis_key: str):
+        self.flush_interval = flush_interval
+        self.max_amount_of_events = max_amount_of_events
+        self.redis_key = redis_key  # Redis list with rates which weren't flushed on shutdown
+        self.rejected_redis_key = rejected_redis_key  # Redis list with rates db refused to apply
+        self.amount_of_replayed_dumps = 0  # Dumps read from redis on start and not removed yet
+        self.titles_rates: dict[int, tuple[int, int]] = {}
+        self.categories_rates: dict[tuple[int, int], int] = {}
+        self.amount_of_events = 0
+        self._redis: typing.Optional[Redis] = None
+        self._flush_requested: typing.Optional[asyncio.Event] = None
+        self._task: typing.Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def add(self, title_id: int, category_id: int, user_id: int, likes_difference: int):
+        """Add rate event to buffer"""
+        self._merge({title_id: (likes_difference, 1)}, {(user_id, category_id): likes_difference})
+        self.amount_of_events += 1
+        if self.amount_of_events >= self.max_amount_of_events:
+            self._flush_requested.set()
+
+    async def flush(self):
+        """Write all buffered rates into db, remove replayed dumps from redis once they are written"""
+        if self.titles_rates or self.categories_rates:
+            await self._apply_buffered_rates()
+        await self._remove_replayed_dumps()
+
+    async def start(self, redis: Redis):
+        """Replay rates left from previous shutdown and start flushing in background
+
+        Dumps are kept in redis until they are written into db, so rates aren't lost if db isn't ready yet.
+        """
+        self._redis = redis
+        self._flush_requested = asyncio.Event()
+        self._stopping = False
+        try:
+            dumps = await redis.lrange(self.redis_key, 0, -1, encoding='utf-8')
+        except (aioredis.RedisError, OSError) as error:
+            logger.error(f'Failed to read rates left from previous shutdown: {error!r}')
+            dumps = []
+        for dumped_rates in dumps:
+            rates = ujson.loads(dumped_rates)
+            self._merge(
+                {title_id: (likes_difference, views) for title_id, likes_difference, views in rates['titles']},
+                {(user_id, category_id): difference for user_id, category_id, difference in rates['categories']},
+            )
+        self.amount_of_replayed_dumps = len(dumps)
+        try:
+            await self.flush()
+        except Exception as error:
+            logger.error(f'Flushing of replayed rates failed: {error!r}, retrying in background')
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop background flushing and flush left rates, dump them into redis if db is unavailable"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._flush_requested.set()
+        await self._task  # Running flush isn't cancelled, its rates would be lost otherwise
+        self._task = None
+        try:
+            await self.flush()
+        except Exception as error:
+            logger.error(f'Failed to flush rates on shutdown: {error!r}, dumping them into redis')
+            await self._dump_into_redis()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as error:
+                logger.exception(f'Rates flushing failed: {error!r}')
+
+    async def _apply_buffered_rates(self):
+        titles_rates, categories_rates = self.titles_rates, self.categories_rates
+        self.titles_rates, self.categories_rates, self.amount_of_events = {}, {}, 0
+        try:
+            await Title.apply_rates(titles_rates, categories_rates)
+        except REJECTED_RATE_ERRORS as error:
+            logger.warning(f'Batch of rates was rejected: {error!r}, applying rates one by one')
+            await self._apply_rates_one_by_one(titles_rates, categories_rates)
+            return
+        except Exception:
+            self._merge(titles_rates, categories_rates)  # Keep rates to retry on next flush
+            raise
+        logger.debug(f'Flushed rates of {len(titles_rates)} titles and {len(categories_rates)} user categories')
+
+    async def _apply_rates_one_by_one(
+            self,
+            titles_rates: dict[int, tuple[int, int]],
+            categories_rates: dict[tuple[int, int], int],
+    ):
+        """Apply every rate separately, so rejected ones don't block the rest and are moved aside"""
+        rates = [({title_id: rate}, {}) for title_id, rate in titles_rates.items()]
+        rates += [({}, {user_category: difference}) for user_category, difference in categories_rates.items()]
+        rejected_titles_rates, rejected_categories_rates = {}, {}
+        for index, (title_rate, category_rate) in enumerate(rates):
+            try:
+                await Title.apply_rates(title_rate, category_rate)
+            except REJECTED_RATE_ERRORS as error:
+                logger.error(f'Rate {title_rate or category_rate} was rejected: {error!r}')
+                rejected_titles_rates.update(title_rate)
+                rejected_categories_rates.update(category_rate)
+            except Exception:
+                for left_title_rate, left_category_rate in rates[index:]:
+                    self._merge(left_title_rate, left_category_rate)  # Keep rates to retry on next flush
+                raise
+        if rejected_titles_rates or rejected_categories_rates:
+            await self._push_into_redis(
+                self.rejected_redis_key,
+                dump_rates(rejected_titles_rates, rejected_categories_rates),
+            )
+
+    async def _remove_replayed_dumps(self):
+        if not self.amount_of_replayed_dumps:
+            return
+        try:
+            await self._redis.ltrim(self.redis_key, self.amount_of_replayed_dumps, -1)
+        except (aioredis.RedisError, OSError) as error:
+            logger.error(f'Failed to remove replayed rates from redis: {error!r}')
+            return
+        self.amount_of_replayed_dumps = 0
+
+    async def _dump_into_redis(self):
+        """Replace replayed dumps which are still in redis with all buffered rates, they include replayed ones"""
+        rates = dump_rates(self.titles_rates, self.categories_rates)
+        try:
+            transaction = self._redis.multi_exec()
+            transaction.ltrim(self.redis_key, self.amount_of_replayed_dumps, -1)
+            transaction.rpush(self.redis_key, ujson.dumps(rates))
+            await transaction.execute()
+        except (aioredis.RedisError, OSError) as error:
+            logger.error(f'Failed to dump rates into redis: {error!r}, lost rates: {rates}')
+            return
+        self.amount_of_replayed_dumps = 0
+
+    async def _push_into_redis(self, key: str, rates: dict[str, list]):
+        try:
+            await self._redis.rpush(key, ujson.dumps(rates))
+        except (aioredis.RedisError, OSError) as error:
+            logger.error(f'Failed to push rates into redis {key}: {error!r}, lost rates: {rates}')
+
+    def _merge(self, titles_rates: dict[int, tuple[int, int]], categories_rates: dict[tuple[int, int], int]):
+        for title_id, (likes_difference, views) in titles_rates.items():
+            buffered_likes_difference, buffered_views = self.titles_rates.get(title_id, (0, 0))
+            self.titles_rates[title_id] = (buffered_likes_difference + likes_difference, buffered_views + views)
+        for user_category, difference in categories_rates.items():
+            self.categories_rates[user_category] = self.categories_rates.get(user_category, 0) + difference
+
+
+def dump_rates(
+        titles_rates: dict[int, tuple[int, int]],
+        categories_rates: dict[tuple[int, int], int],
+) -> dict[str, list]:
+    """Convert rates into json serializable form"""
+    return {
+        'titles': [
+            [title_id, likes_difference, views]
+            for title_id, (likes_difference, views) in titles_rates.items()
+        ],
+        'categories': [
+            [user_id, category_id, difference]
+            for (user_id, category_id), difference in categories_rates.items()
+        ],
+    }
+
+
+rating_buffer = RatingBuffer(
+    flush_interval=RatingBufferSettings.FLUSH_INTERVAL.value,
+    max_amount_of_events=RatingBufferSettings.MAX_AMOUNT_OF_EVENTS.value,
+    redis_key=RatingBufferSettings.REDIS_KEY.value,
+    rejected_redis_key=RatingBufferSettings.REJECTED_REDIS_KEY.value,
+)
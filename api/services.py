@@ -0,0 +1,246 @@
+"""Application logic independent of transport, user session is any mutable mapping
+
+It's used by http handlers with aiohttp sessions and by bot working in the same process with sessions in its state.
+"""
+import asyncio
+import random
+import re
+import string
+import typing
+from email.mime.text import MIMEText
+
+from api.mail import Mailer, SMTPTransport, MemoryTransport
+from api.passwords import PasswordExecutor
+from api.rating_buffer import rating_buffer
+from database.models import db, User, Title, CategoryRating
+from shared.constants import (
+    PasswordErrorMessage,
+    LoginErrorMessage,
+    Codes,
+    RateCommand,
+    RequiredData,
+    PASSWORD_COMPOUNDS_REQUIREMENTS_PATTERN,
+    LOGIN_COMPOUNDS_REQUIREMENTS_PATTERN,
+    PASSWORD_SYMBOLS_REQUIREMENTS_PATTERN,
+    SearchType,
+    EMAIL_COMPOUNDS_REQUIREMENTS_PATTERN,
+    URL,
+    EmailMessage,
+    EmailErrorMessage,
+    MailTransportType,
+    MailerSettings,
+    ServedTitlesSettings,
+    RatedFactSettings,
+    RandomFactSettings,
+)
+from shared.exceptions import PasswordError, LoginError, EmailError, IncorrectDataError, ServiceUnavailableError
+from shared.project_settings import settings
+from shared.utilities import get_all_enum_values, AliasTable
+from wiki_searcher.fact_pool import fact_pool
+from wiki_searcher.searcher import WikiSearcher
+
+password_executor = PasswordExecutor(settings.password_executor, settings.password_workers)
+mailer = Mailer(
+    SMTPTransport(
+        settings.smtp_server,
+        settings.smtp_port,
+        settings.smtp_use_ssl,
+        settings.service_account_name,
+        settings.service_account_password,
+        MailerSettings.SMTP_TIMEOUT.value,
+    ) if settings.mail_transport == MailTransportType.SMTP.value else MemoryTransport(),
+    queue_size=MailerSettings.QUEUE_SIZE.value,
+    max_attempts=MailerSettings.MAX_ATTEMPTS.value,
+    retry_delay=MailerSettings.RETRY_DELAY.value,
+    shutdown_timeout=MailerSettings.SHUTDOWN_TIMEOUT.value,
+)
+
+
+async def register_user(data: dict[str], session: typing.MutableMapping) -> dict[str]:
+    """Register user, new session keeps email confirmation token"""
+    await _check_if_data_correct(data)
+    hashed_password = await password_executor.hash_password(data['password'])
+    async with db.transaction():  # User isn't kept if confirmation mail can't be queued
+        if RequiredData.TELEGRAM_ID.value in data.keys():
+            user = await User.create(
+                username=data['username'],
+                password=hashed_password,
+                telegram_id=data['telegram_id'],
+                email=data['email'],
+            )
+        else:
+            user = await User.create(
+                username=data['username'],
+                password=hashed_password,
+                email=data['email'],
+            )
+        token = send_confirmation_url(data['email'])
+    session['user_id'], session['token'] = user.id, token
+    return {'result': Codes.SUCCESS.value}
+
+
+async def confirm_email(token: str, session: typing.MutableMapping) -> dict[str]:
+    """Process users email confirmation"""
+    if 'token' not in session or token != session['token']:
+        raise IncorrectDataError('Incorrect token')
+    user = await User.get(session['user_id'])
+    await user.update(email_confirmed=True).apply()
+    session['status'] = Codes.AUTHORIZED.value
+    return {'result': Codes.SUCCESS.value}
+
+
+async def login_user(data: dict[str], session: typing.MutableMapping) -> dict[str]:
+    """Login user filling new session"""
+    username = data['username']
+    user = await User.get_user_by_username(username)
+    if user:
+        if await password_executor.check_password(data['password'], user.password) and user.email_confirmed:
+            session['username'], session['user_id'], session['status'] = username, user.id, Codes.AUTHORIZED.value
+            return {'result': Codes.SUCCESS.value}
+    raise LoginError(LoginErrorMessage.INCORRECT_DATA.value)
+
+
+def send_confirmation_url(users_email: str) -> str:
+    """Queue sending of confirmation url to user's email"""
+    token = ''.join(random.choice(string.digits + string.ascii_letters) for _ in range(10))
+    message = MIMEText(
+        EmailMessage.CONFIRMATION.value + URL.EMAIL_CONFIRMATION.value + token,
+        'plain'
+    )
+    message['Subject'], message['From'], message['To'] = 'Email confirmation', \
+                                                         settings.service_account_name, \
+                                                         users_email
+    try:
+        mailer.send(message)
+    except asyncio.QueueFull:
+        raise ServiceUnavailableError('Too many registrations, try again later')
+    return token
+
+
+async def get_random_fact_info() -> str:
+    """Get random wiki page info"""
+    fact = fact_pool.pop()
+    if fact is not None:
+        return fact.description
+    searcher = WikiSearcher(action='query', format='json')
+    random_facts = await searcher.get_random_wiki_facts(RandomFactSettings.PAGES_PER_FACT.value)
+    if not random_facts:
+        raise ServiceUnavailableError('Fact is not found, try again later')
+    return next(iter(random_facts.values()))
+
+
+async def get_random_facts_info(amount: int) -> list[dict[str]]:
+    """Get several random wiki pages info, ready facts are used at first"""
+    facts = {}
+    while len(facts) < amount and (fact := fact_pool.pop()) is not None:
+        facts[fact.title_name] = fact.description
+    searcher = WikiSearcher(action='query', format='json')
+    for _ in range(RandomFactSettings.MAX_REQUESTS.value):  # Some random pages have no intro
+        if len(facts) >= amount:
+            break
+        facts.update(await searcher.get_random_wiki_facts(amount - len(facts)))
+    return [{'title_name': title_name, 'random_fact': description} for title_name, description in facts.items()]
+
+
+async def get_random_rated_fact_info(session: typing.MutableMapping, search_type: str) -> tuple[str, str, int]:
+    """Get random rated fact with its title name and id"""
+    if search_type not in get_all_enum_values(SearchType):
+        raise IncorrectDataError('Incorrect search type')
+    random_category_id = await _process_random_category_choosing(session, search_type)
+    fact = fact_pool.pop(random_category_id)
+    if fact is not None:
+        _remember_served_title(session, fact.title_id, fact.title_type_id)
+        return fact.description, fact.title_name, fact.title_id
+    searcher = WikiSearcher(action='query', format='json')
+    for _ in range(RatedFactSettings.MAX_ATTEMPTS.value):
+        rated_title = await Title.get_random_title_by_category(random_category_id)
+        if rated_title is None:  # Ranked categories include ones without titles yet
+            random_category_id = await _process_random_category_choosing(session, search_type)
+            continue
+        object_description = rated_title.extract
+        if object_description is None:  # Extract isn't prefetched yet, empty one means page is missing
+            object_description = await searcher.get_object_wiki_info(rated_title.title_name)
+        if object_description:
+            _remember_served_title(session, rated_title.id, rated_title.title_type_id)
+            return object_description, rated_title.title_name, rated_title.id
+    raise ServiceUnavailableError('Fact is not found, try again later')
+
+
+async def process_rating(data: dict, session: typing.MutableMapping) -> tuple[str, str, dict[str]]:
+    """Process rating command"""
+    command = data['command']
+    if command in (RateCommand.LIKE.value, RateCommand.DISLIKE.value):
+        title_id, title_type_id = _get_rated_title(data, session)
+        session.pop('category_samplers', None)  # Categories ratings are changed so weights are outdated
+        likes_difference = 1 if command == RateCommand.LIKE.value else -1
+        if rating_buffer.started and title_type_id is not None:
+            rating_buffer.add(title_id, title_type_id, session['user_id'], likes_difference)
+        else:
+            await Title.apply_rate(title_id, session['user_id'], likes_difference)
+    result = {"result": Codes.SUCCESS.value}
+    return session['username'], command, result
+
+
+def _remember_served_title(session: typing.MutableMapping, title_id: int, title_type_id: int):
+    """Keep last served title and a few previous ones which can still be rated by id"""
+    session['last_rated_topic_id'], session['last_rated_topic_type_id'] = title_id, title_type_id
+    served_titles = session.get(ServedTitlesSettings.SESSION_KEY.value, {})
+    served_titles.pop(str(title_id), None)
+    served_titles[str(title_id)] = title_type_id  # Session is stored as json so keys are strings
+    while len(served_titles) > ServedTitlesSettings.MAX_AMOUNT.value:
+        served_titles.pop(next(iter(served_titles)))
+    session[ServedTitlesSettings.SESSION_KEY.value] = served_titles
+
+
+def _get_rated_title(data: dict, session: typing.MutableMapping) -> tuple[int, typing.Optional[int]]:
+    """Get id and type id of title to rate, it is the last served title if id isn't passed"""
+    if RequiredData.TITLE_ID.value not in data.keys():
+        if 'last_rated_topic_id' not in session:
+            raise IncorrectDataError('There is no fact to rate')
+        return session['last_rated_topic_id'], session.get('last_rated_topic_type_id')
+    title_id = data[RequiredData.TITLE_ID.value]
+    served_titles = session.get(ServedTitlesSettings.SESSION_KEY.value, {})
+    if str(title_id) not in served_titles:
+        raise IncorrectDataError('This fact was not served to you recently')
+    return title_id, served_titles[str(title_id)]
+
+
+async def _check_if_data_correct(data: dict[str]):
+    """Check if data is ok with the requirements"""
+    password = data['password']
+    user_exist = await User.check_if_user_already_exist(data['username'], data['email'])
+    if user_exist:
+        raise LoginError(LoginErrorMessage.USER_ALREADY_EXIST.value)
+    elif password != data['repeated_password']:
+        raise PasswordError(PasswordErrorMessage.UNMATCHED_PASSWORD.value)
+    elif (
+            not PASSWORD_SYMBOLS_REQUIREMENTS_PATTERN.search(password)
+            or not PASSWORD_COMPOUNDS_REQUIREMENTS_PATTERN.match(password)
+    ):
+        raise PasswordError(PasswordErrorMessage.INELIGIBLE_PASSWORD.value)
+    elif not LOGIN_COMPOUNDS_REQUIREMENTS_PATTERN.match(data['username']):
+        raise LoginError(LoginErrorMessage.INELIGIBLE_LOGIN.value)
+    elif not re.match(EMAIL_COMPOUNDS_REQUIREMENTS_PATTERN, data['email']):
+        raise EmailError(EmailErrorMessage.INCORRECT_EMAIL.value)
+
+
+async def _process_random_category_choosing(session: typing.MutableMapping, search_type: str) -> int:
+    """Get random category id weighted by user's categories ratings, weights are cached in session"""
+    samplers = session.get('category_samplers', {})
+    if search_type in samplers:
+        return AliasTable.from_dict(samplers[search_type]).choose()
+    if search_type == SearchType.TOP_FACTS.value:
+        categories = await User.get_users_top_categories_id(5, session['user_id'])
+    else:
+        categories = await User.get_new_users_categories_id(5, session['user_id'])
+    sampler = AliasTable.from_weights(
+        [category.category_id for category in categories],
+        [_get_category_weight(category) for category in categories],
+    )
+    session['category_samplers'] = {**samplers, search_type: sampler.to_dict()}
+    return sampler.choose()
+
+
+def _get_category_weight(category: 'CategoryRating') -> int:
+    """Get category choosing weight by its rating, not liked categories still can be chosen"""
+    return max(category.rating_number, 0) + 1
@@ -0,0 +1,80 @@
+"""Login throughput benchmark with bcrypt checking inline in event loop and in password executor
+
+Every simulated login checks password and awaits some io to imitate db and session storage calls.
+Event loop lag shows how long other requests would wait while bcrypt is blocking the loop.
+
+$ python3 benchmarks/login_throughput.py --logins 64 --concurrency 16
+"""
+import argparse
+import asyncio
+import time
+
+import bcrypt
+
+from api.passwords import PasswordExecutor, hash_password
+from shared.constants import PasswordExecutorType
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Get max delay of scheduled wake up while benchmark is running"""
+    max_lag = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - started - interval)
+    return max_lag
+
+
+async def run_benchmark(executor_type: str, workers: int, logins: int, concurrency: int, io_delay: float) -> dict:
+    executor = PasswordExecutor(executor_type, workers)
+    executor.start()
+    hashed_password = hash_password('Password123')
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            await asyncio.sleep(io_delay)  # User fetching
+            await executor.check_password('Password123', hashed_password)
+            await asyncio.sleep(io_delay)  # Session saving
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    max_lag = await lag_task
+    stats = executor.get_stats()
+    await executor.stop()
+    return {
+        'executor': executor_type,
+        'logins_per_second': round(logins / elapsed, 1),
+        'max_loop_lag_ms': round(max_lag * 1000, 1),
+        'max_queue_depth': stats['max_queue_depth'],
+    }
+
+
+async def main(arguments: argparse.Namespace):
+    print(f'bcrypt cost {bcrypt.gensalt().decode()[4:6]}, {arguments.logins} logins, '
+          f'concurrency {arguments.concurrency}, workers {arguments.workers}')
+    for executor_type in (
+            PasswordExecutorType.INLINE.value,
+            PasswordExecutorType.THREAD.value,
+            PasswordExecutorType.PROCESS.value,
+    ):
+        print(await run_benchmark(
+            executor_type,
+            arguments.workers,
+            arguments.logins,
+            arguments.concurrency,
+            arguments.io_delay,
+        ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--io-delay', type=float, default=0.01, help='seconds of imitated io per call')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,154 @@
+"""Load test of bot webhook with fake telegram updates
+
+Every fake chat sends /start, presses 'Yes' and types username, one update after another like telegram does.
+Replies of bot are caught by telegram bot api stub, which checks that every chat got them in order.
+
+Stub has to be set as telegram_api_server in config.json of webhook app, e.g. "http://localhost:8081".
+Webhook path with secret is made of bot token from the same config.json:
+$ python3 benchmarks/webhook_load.py --serve-stub 8081
+$ python3 bot/webhook.py
+$ python3 benchmarks/webhook_load.py --base-url http://localhost:8001 --chats 500 --concurrency 100
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+from shared.project_settings import settings
+from shared.utilities import create_webhook_path
+
+EXPECTED_REPLIES = [
+    'Welcome to yours procrastination supporter, have you already registered?',
+    'Type your username',
+    'Type your password',
+]
+update_ids = itertools.count(1)
+
+
+def create_user(chat_id: int) -> dict:
+    return {'id': chat_id, 'is_bot': False, 'first_name': f'Load{chat_id}'}
+
+
+def create_message(chat_id: int, text: str) -> dict:
+    message = {
+        'message_id': next(update_ids),
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private'},
+        'from': create_user(chat_id),
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+    return message
+
+
+def create_chat_updates(chat_id: int) -> list[dict]:
+    """Create updates of one chat in order they have to be processed"""
+    return [
+        {'update_id': next(update_ids), 'message': create_message(chat_id, '/start')},
+        {
+            'update_id': next(update_ids),
+            'callback_query': {
+                'id': str(next(update_ids)),
+                'from': create_user(chat_id),
+                'chat_instance': str(chat_id),
+                'message': create_message(chat_id, EXPECTED_REPLIES[0]),
+                'data': 'Yes',
+            },
+        },
+        {'update_id': next(update_ids), 'message': create_message(chat_id, f'load_user{chat_id}')},
+    ]
+
+
+async def send_chat_updates(
+        session: aiohttp.ClientSession,
+        url: str,
+        chat_id: int,
+        semaphore: asyncio.Semaphore,
+        latencies: list[float],
+        statuses: collections.Counter,
+):
+    async with semaphore:
+        for update in create_chat_updates(chat_id):
+            started = time.perf_counter()
+            async with session.post(url, json=update) as response:
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status] += 1
+
+
+async def run_load(url: str, chats: int, concurrency: int, first_chat_id: int) -> dict:
+    latencies = []
+    statuses = collections.Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        await asyncio.gather(*(
+            send_chat_updates(session, url, chat_id, semaphore, latencies, statuses)
+            for chat_id in range(first_chat_id, first_chat_id + chats)
+        ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'updates': len(latencies),
+        'elapsed': round(elapsed, 2),
+        'updates_per_second': round(len(latencies) / elapsed, 1),
+        'statuses': dict(statuses),
+        'median_latency_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_latency_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+    }
+
+
+def create_stub_app() -> web.Application:
+    """Telegram bot api stub answering every method and keeping texts sent to every chat"""
+    replies: dict[int, list[str]] = collections.defaultdict(list)
+    message_ids = itertools.count(1)
+
+    async def process_method(request: web.Request) -> web.Response:
+        data = await request.post()
+        if request.match_info['method'] != 'sendMessage':
+            return web.json_response({'ok': True, 'result': True})
+        chat_id = int(data['chat_id'])
+        replies[chat_id].append(data['text'])
+        return web.json_response({
+            'ok': True,
+            'result': {
+                'message_id': next(message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': data['text'],
+            },
+        })
+
+    async def get_report(request: web.Request) -> web.Response:
+        wrong_order = [chat_id for chat_id, texts in replies.items() if texts != EXPECTED_REPLIES]
+        return web.json_response({'chats': len(replies), 'chats_with_wrong_replies': len(wrong_order)})
+
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', process_method)
+    app.router.add_get('/report', get_report)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8001', help='base url of webhook app')
+    parser.add_argument('--chats', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50, help='chats sending updates at the same time')
+    parser.add_argument('--first-chat-id', type=int, default=1_000_000)
+    parser.add_argument('--serve-stub', type=int, metavar='PORT', help='run telegram bot api stub instead of load')
+    args = parser.parse_args()
+    if args.serve_stub:
+        web.run_app(create_stub_app(), port=args.serve_stub)
+        return
+    url = args.base_url.rstrip('/') + create_webhook_path(settings.webhook_path, settings.telegram_token)
+    print(asyncio.run(run_load(url, args.chats, args.concurrency, args.first_chat_id)))
+    print('Replies order report is available at /report of telegram bot api stub')
+
+
+if __name__ == '__main__':
+    main()
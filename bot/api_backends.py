@@ -0,0 +1,239 @@
+"""Ways for bot to use API: over http or by calling its services in bot process"""
+import asyncio
+import typing
+
+import ujson
+from aiogram.dispatcher import FSMContext
+from loguru import logger
+
+from aioredis import Redis
+
+from bot.api_client import api_client
+from shared.constants import URL, CurrentTask, SearchType, ContentType, Codes, TitlesIndexSettings, ApiTransportType
+from shared.exceptions import (
+    PasswordError,
+    LoginError,
+    EmailError,
+    AuthorizationError,
+    IncorrectDataError,
+    ServiceUnavailableError,
+)
+from shared.project_settings import settings
+
+
+class HttpApiBackend:
+    """API used over http, user session key is kept in bot state"""
+
+    async def start(self):
+        api_client.start()
+
+    async def stop(self):
+        await api_client.stop()
+
+    async def register_user(self, user_info: dict[str]) -> tuple[typing.Union[dict[str], str], bool]:
+        """Process Http request to api to register user"""
+        async with api_client.request('POST', URL.REGISTER.value, json=user_info) as response:
+            content_type = response.content_type
+            if content_type != ContentType.JSON.value:
+                successful = False
+                error_text = await response.text()
+                return error_text, successful
+            result = await response.json(loads=ujson.loads)
+        return result, is_successful(result)
+
+    async def login_user(self, user_info: dict[str], state: FSMContext) -> tuple[dict[str], bool]:
+        """Process Http request to login user"""
+        async with api_client.request('POST', URL.LOGIN.value, json=user_info) as response:
+            result = await response.json(loads=ujson.loads)
+        if not is_successful(result):
+            return result, False
+        async with state.proxy() as data:
+            data['session_key'] = api_client.get_session_key(response)
+        await update_api_state(state, prefetched_fact=None)  # It was served in previous session
+        return result, True
+
+    async def get_random_rated_fact(self, state: FSMContext, search_type: str) -> dict[str]:
+        """Process Http request to get random rated fact with its title name and id"""
+        async with state.proxy() as data:
+            session_key = data['session_key']
+        url = URL.RANDOM_RATED_FACT.value + get_api_search_type(search_type)
+        async with api_client.request('GET', url, session_key) as response:
+            result = await response.json(loads=ujson.loads)
+        return create_fact(search_type, result['random_rated_fact'], result['title_name'], result.get('title_id'))
+
+    async def rate_fact(self, state: FSMContext, rate_command: str, title_id: typing.Optional[int]):
+        """Process http request to rate random fact"""
+        async with state.proxy() as data:
+            session_key = data['session_key']
+        async with api_client.request(
+                'POST',
+                URL.RATE_FACT.value,
+                session_key,
+                json=create_rating(rate_command, title_id),
+        ) as response:
+            if response.status != 200:
+                logger.warning(f'Rating of title {title_id} failed: {response.status} {await response.text()}')
+
+
+class InProcessApiBackend:
+    """API services called in bot process without http round trips, user session is kept in bot state
+
+    API modules are imported only by this backend, so bot working over http doesn't build API components.
+    """
+
+    def __init__(self, start_components: bool):
+        self.start_components = start_components  # They are already started if bot works inside API app
+        self._redis: typing.Optional[Redis] = None
+        self._titles_index_refreshing: typing.Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start API components used by services, extracts prefetching is left to API app"""
+        if not self.start_components:
+            return
+        from api import services
+        from api.rating_buffer import rating_buffer
+        from api.utilities import create_redis_connection, refresh_titles_ids_index_periodically
+        from database.models import connect_to_db, Title
+        from wiki_searcher.cache import extract_cache
+        from wiki_searcher.fact_pool import fact_pool
+        from wiki_searcher.searcher import WikiSearcher
+        self._redis = await create_redis_connection()
+        extract_cache.set_redis(self._redis)
+        await connect_to_db(settings.create_db_uri())
+        logger.info(f'Loaded {await Title.refresh_titles_ids_index()} titles into titles ids index')
+        self._titles_index_refreshing = asyncio.create_task(
+            refresh_titles_ids_index_periodically(
+                TitlesIndexSettings.REFRESH_PERIOD.value,
+                TitlesIndexSettings.FULL_RELOAD_PERIOD.value,
+            )
+        )
+        services.password_executor.start()
+        services.mailer.start()
+        if settings.rating_write_behind:
+            await rating_buffer.start(self._redis)
+        await WikiSearcher.start_session()
+        await fact_pool.start()
+
+    async def stop(self):
+        if not self.start_components:
+            return
+        from api import services
+        from api.rating_buffer import rating_buffer
+        from database.models import db
+        from wiki_searcher.cache import extract_cache
+        from wiki_searcher.fact_pool import fact_pool
+        from wiki_searcher.searcher import WikiSearcher
+        await fact_pool.stop()
+        self._titles_index_refreshing.cancel()
+        try:
+            await self._titles_index_refreshing
+        except asyncio.CancelledError:
+            pass
+        await WikiSearcher.close_session()
+        await rating_buffer.stop()
+        await services.password_executor.stop()
+        await services.mailer.stop()
+        extract_cache.set_redis(None)
+        self._redis.close()
+        await self._redis.wait_closed()
+        await db.pop_bind().close()
+
+    async def register_user(self, user_info: dict[str]) -> tuple[typing.Union[dict[str], str], bool]:
+        from api import services
+        try:
+            # Bot logs user in after registration, so registration session isn't kept like with http
+            return await services.register_user(user_info, {}), True
+        except (LoginError, PasswordError, EmailError) as error:
+            return {'error': str(error)}, False
+        except ServiceUnavailableError as error:
+            return str(error), False
+
+    async def login_user(self, user_info: dict[str], state: FSMContext) -> tuple[dict[str], bool]:
+        from api import services
+        session = {}
+        try:
+            result = await services.login_user(user_info, session)
+        except LoginError as error:
+            return {'error': str(error)}, False
+        await update_api_state(state, api_session=session, prefetched_fact=None)  # Fact was served in previous session
+        return result, True
+
+    async def get_random_rated_fact(self, state: FSMContext, search_type: str) -> dict[str]:
+        from api import services
+        session = await self._get_session(state)
+        description, title_name, title_id = await services.get_random_rated_fact_info(
+            session,
+            get_api_search_type(search_type),
+        )
+        await update_api_state(state, api_session=session)
+        return create_fact(search_type, description, title_name, title_id)
+
+    async def rate_fact(self, state: FSMContext, rate_command: str, title_id: typing.Optional[int]):
+        from api import services
+        session = await self._get_session(state)
+        try:
+            await services.process_rating(create_rating(rate_command, title_id), session)
+        except IncorrectDataError as error:
+            logger.warning(f'Rating of title {title_id} failed: {error}')
+            return
+        await update_api_state(state, api_session=session)
+
+    @staticmethod
+    async def _get_session(state: FSMContext) -> dict[str]:
+        """Get session of logged in user from bot state"""
+        session = (await get_api_state(state)).get('api_session') or {}
+        if 'status' not in session:
+            raise AuthorizationError('Requires authorization or email not confirmed')
+        return session
+
+
+async def get_api_state(state: FSMContext) -> dict[str]:
+    """Get data written by API calls, it's kept in storage bucket apart from data written by handlers
+
+    API calls run in background, so writing their results into handlers data could overwrite concurrent changes.
+    """
+    return await state.storage.get_bucket(chat=state.chat, user=state.user, default={})
+
+
+async def update_api_state(state: FSMContext, **kwargs):
+    await state.storage.update_bucket(chat=state.chat, user=state.user, **kwargs)
+
+
+async def reset_api_state(state: FSMContext):
+    await state.storage.reset_bucket(chat=state.chat, user=state.user)
+
+
+def is_successful(result: dict[str]) -> bool:
+    return 'result' in result.keys() and result['result'] == Codes.SUCCESS.value
+
+
+def get_api_search_type(search_type: str) -> str:
+    """Get API search type by bot task"""
+    if search_type == CurrentTask.GET_NEW_FACT.value:
+        return SearchType.NEW_FACTS.value
+    return SearchType.TOP_FACTS.value
+
+
+def create_fact(search_type: str, description: str, title_name: str, title_id: typing.Optional[int]) -> dict[str]:
+    return {
+        'search_type': search_type,
+        'random_rated_fact': description,
+        'title_name': title_name,
+        'title_id': title_id,
+    }
+
+
+def create_rating(rate_command: str, title_id: typing.Optional[int]) -> dict[str]:
+    rating = {'command': rate_command}
+    if title_id is not None:
+        rating['title_id'] = title_id
+    return rating
+
+
+def create_api_backend() -> typing.Union[HttpApiBackend, InProcessApiBackend]:
+    if settings.bot_api_transport == ApiTransportType.IN_PROCESS.value:
+        return InProcessApiBackend(start_components=not settings.bot_webhook_in_api)
+    return HttpApiBackend()
+
+
+api_backend = create_api_backend()
@@ -0,0 +1,60 @@
+"""Http client of procrastination API shared by bot handlers"""
+import contextlib
+import typing
+
+import aiohttp
+import ujson
+
+from shared.constants import ApiClientSettings
+
+
+class ApiClient:
+    """Client keeping pool of keep-alive connections to API, user session cookie is passed with every request"""
+
+    def __init__(self, connections_limit: int, keepalive_timeout: int, request_timeout: int):
+        self.connections_limit = connections_limit
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self._session: typing.Optional[aiohttp.ClientSession] = None
+
+    def start(self):
+        """Create http session, its cookie jar is dummy since cookies of many users mustn't be mixed in it"""
+        connector = aiohttp.TCPConnector(limit=self.connections_limit, keepalive_timeout=self.keepalive_timeout)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            json_serialize=ujson.dumps,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+        )
+
+    async def stop(self):
+        """Close http session with all its connections"""
+        if self._session is None:
+            return
+        session, self._session = self._session, None
+        await session.close()
+
+    @contextlib.asynccontextmanager
+    async def request(
+            self,
+            method: str,
+            url: str,
+            session_key: typing.Optional[str] = None,
+            **kwargs: typing.Any,
+    ) -> typing.AsyncIterator[aiohttp.ClientResponse]:
+        """Make request to API on behalf of user with passed session key, connection is released on exit"""
+        cookies = {ApiClientSettings.SESSION_COOKIE.value: session_key} if session_key else None
+        async with self._session.request(method, url, cookies=cookies, **kwargs) as response:
+            yield response
+
+    @staticmethod
+    def get_session_key(response: aiohttp.ClientResponse) -> str:
+        """Get user session key set by API"""
+        return response.cookies[ApiClientSettings.SESSION_COOKIE.value].value
+
+
+api_client = ApiClient(
+    connections_limit=ApiClientSettings.CONNECTIONS_LIMIT.value,
+    keepalive_timeout=ApiClientSettings.KEEPALIVE_TIMEOUT.value,
+    request_timeout=ApiClientSettings.REQUEST_TIMEOUT.value,
+)
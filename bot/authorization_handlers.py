@@ -2,10 +2,9 @@ from aiogram import types, Dispatcher
 from aiogram.dispatcher import FSMContext
 from loguru import logger
 
+from bot.api_backends import api_backend
 from bot.constants import AuthorizationForm
 from bot.utilities import (
-    register_user,
-    login_user,
     process_authorization_error_scenario,
     process_successful_authorization,
 )
@@ -34,7 +33,7 @@ async def process_password(message: types.Message, state: FSMContext):
         await AuthorizationForm.repeated_password.set()
         return
     user_info = await state.get_data('user_info')
-    response, successful = await login_user(user_info['user_info'], state)
+    response, successful = await api_backend.login_user(user_info['user_info'], state)
     if not successful:
         await process_authorization_error_scenario(message, response, 'login')
         return
@@ -56,13 +55,13 @@ async def process_email(message: types.Message, state: FSMContext):
         user_to_register = data['user_info']
     user_to_register['email'] = message.text
     logger.debug(f'Telegram user: {message.from_user.id} has submitted email: {message.text}')
-    response, successful = await register_user(user_to_register)
+    response, successful = await api_backend.register_user(user_to_register)
     if not successful:
         logger.debug(f'Unsuccessful registration by user: {message.from_user.id}')
         await process_authorization_error_scenario(message, response, 'registration')
         return
     user_info = {'username': user_to_register['username'], 'password': user_to_register['password']}
-    await login_user(user_info, state)
+    await api_backend.login_user(user_info, state)
     logger.debug(f'Successful registration by user: {user_info["username"]}')
     await process_successful_authorization(message, 'registration')
 
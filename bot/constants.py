@@ -1,11 +1,38 @@
 from aiogram import Bot, Dispatcher
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.contrib.fsm_storage.redis import RedisStorage2
+from aiogram.dispatcher.storage import BaseStorage
 from aiogram.dispatcher.filters.state import State, StatesGroup
 
+from bot.middlewares import FSMTTLRefreshingMiddleware
+from shared.constants import FSMStorageType, FSMStorageSettings
 from shared.project_settings import settings
 
-bot = Bot(settings.telegram_token)
-dp = Dispatcher(bot, storage=MemoryStorage())
+
+def create_fsm_storage() -> BaseStorage:
+    """Create storage of conversations state, redis keys expire after fsm_ttl seconds without user updates"""
+    if settings.fsm_storage == FSMStorageType.REDIS.value:
+        return RedisStorage2(
+            host=FSMStorageSettings.REDIS_HOST.value,
+            port=FSMStorageSettings.REDIS_PORT.value,
+            password=settings.redis_password,
+            prefix=FSMStorageSettings.KEY_PREFIX.value,
+            state_ttl=settings.fsm_ttl,
+            data_ttl=settings.fsm_ttl,
+            bucket_ttl=settings.fsm_ttl,
+        )
+    return MemoryStorage()
+
+
+bot = Bot(
+    settings.telegram_token,
+    server=TelegramAPIServer.from_base(settings.telegram_api_server) if settings.telegram_api_server
+    else TELEGRAM_PRODUCTION,
+)
+dp = Dispatcher(bot, storage=create_fsm_storage())
+if isinstance(dp.storage, RedisStorage2):
+    dp.middleware.setup(FSMTTLRefreshingMiddleware(dp.storage, settings.fsm_ttl))
 
 
 class AuthorizationForm(StatesGroup):
@@ -7,15 +7,17 @@ from aiogram.dispatcher import filters
 from aiogram.utils.executor import start_polling
 from loguru import logger
 
+from bot.api_backends import api_backend, reset_api_state
 from bot.authorization_handlers import register_authorization_module
 from bot.constants import bot, dp, AuthorizationForm, MainForm
 from bot.utilities import (
     show_login_menu,
     process_showing_random_fact,
-    rate_fact,
+    process_rating_in_background,
     process_showing_main_menu,
 )
 from shared.constants import CurrentTask, RateCommand, Wiki
+from shared.project_settings import settings
 
 
 @dp.message_handler(commands='start')
@@ -47,6 +49,7 @@ async def processing_start_command_working(message: Union[types.Message, types.C
 async def get_back_to_login_page(message: types.CallbackQuery, state: FSMContext):
     """Get user back to main page"""
     await state.reset_data()
+    await reset_api_state(state)
     await show_login_menu(bot, message.from_user.id)
     await MainForm.start.set()
 
@@ -64,7 +67,7 @@ async def process_getting_random_fact(message: types.CallbackQuery, state: FSMCo
                 data['current_task'] = message.data
         await process_showing_random_fact(bot, state, message)
     if message.data in (RateCommand.LIKE.value, RateCommand.DISLIKE.value):
-        await rate_fact(state, message.data)
+        await process_rating_in_background(state, message.from_user.id, message.data)
         await process_showing_main_menu(bot, message, 'Thank you for your mark! Do you want to get more?')
     if message.data == RateCommand.MORE_INFO.value:
         async with state.proxy() as data:
@@ -79,11 +82,14 @@ async def process_getting_random_fact(message: types.CallbackQuery, state: FSMCo
 async def on_startup(dispatcher: Dispatcher):
     logger.info('Register modules handlers')
     register_authorization_module(dispatcher)
+    logger.info(f'Starting up {settings.bot_api_transport} API backend')
+    await api_backend.start()
     logger.info('Finished Starting up bot')
 
 
 async def on_shutdown(dispatcher: Dispatcher):
     logger.warning('Shutting down bot')
+    await api_backend.stop()
     await dispatcher.storage.close()
     await dispatcher.storage.wait_closed()
 
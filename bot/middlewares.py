@@ -0,0 +1,30 @@
+"""Bot middlewares"""
+from aiogram import types
+from aiogram.contrib.fsm_storage.redis import RedisStorage2
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+
+class FSMTTLRefreshingMiddleware(BaseMiddleware):
+    """Prolong ttl of user conversation state, data and bucket on every update, so they expire only without activity
+
+    RedisStorage2 sets ttl of a key only when it's written, and state isn't written while user browses facts.
+    """
+
+    def __init__(self, storage: RedisStorage2, ttl: int):
+        super().__init__()
+        self.storage = storage
+        self.ttl = ttl
+
+    async def on_pre_process_message(self, message: types.Message, data: dict):
+        await self._refresh_ttl(message.chat.id, message.from_user.id)
+
+    async def on_pre_process_callback_query(self, callback_query: types.CallbackQuery, data: dict):
+        chat = callback_query.message.chat if callback_query.message else callback_query.from_user
+        await self._refresh_ttl(chat.id, callback_query.from_user.id)
+
+    async def _refresh_ttl(self, chat_id: int, user_id: int):
+        redis = await self.storage.redis()
+        pipeline = redis.pipeline()
+        for key_type in ('state', 'data', 'bucket'):
+            pipeline.expire(self.storage.generate_key(chat_id, user_id, key_type), self.ttl)
+        await pipeline.execute()
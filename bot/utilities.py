@@ -1,14 +1,18 @@
+import asyncio
+import functools
 import itertools
 import json
-from typing import Optional, Any, Union
+from typing import Optional, Any, Union, Awaitable
 
-import ujson
 from aiogram import Bot, types
 from aiogram.dispatcher import FSMContext
-from aiohttp import ClientSession
+from loguru import logger
 from shared.utilities import get_all_enum_values
+from bot.api_backends import api_backend, get_api_state, update_api_state
 from bot.constants import AuthorizationForm, MainForm
-from shared.constants import URL, CurrentTask, SearchType, RateCommand, ContentType
+from shared.constants import CurrentTask, RateCommand
+
+background_tasks: dict[int, asyncio.Task] = {}  # Last background API call of every user
 
 
 async def process_showing_random_fact(bot: Bot,
@@ -17,15 +21,60 @@ async def process_showing_random_fact(bot: Bot,
                                       ):
     """Process showing random fact for user"""
     async with state.proxy() as data:
-        if message.data == RateCommand.NEXT:
+        if message.data == RateCommand.NEXT.value:
             search_type = data['current_task']
         else:
             search_type = message.data
+    await wait_for_background_tasks(message.from_user.id)  # Next fact could be still prefetching
+    fact = (await get_api_state(state)).get('prefetched_fact')
+    await update_api_state(state, prefetched_fact=None)
+    if fact is None or fact['search_type'] != search_type:
+        fact = await api_backend.get_random_rated_fact(state, search_type)
+    async with state.proxy() as data:
+        data['last_rated_topic_name'] = fact['title_name']
+        data['last_rated_title_id'] = fact['title_id']
+    run_in_background(message.from_user.id, prefetch_random_rated_fact(state, search_type))
+    await process_showing_main_menu(bot, message, f'{fact["title_name"]}\n\n{fact["random_rated_fact"]}')
+
 
-    random_fact, random_fact_title = await get_random_rated_fact(state, search_type)
+async def prefetch_random_rated_fact(state: FSMContext, search_type: str):
+    """Get next random rated fact in advance to show it at once"""
+    fact = await api_backend.get_random_rated_fact(state, search_type)
+    await update_api_state(state, prefetched_fact=fact)
+
+
+async def process_rating_in_background(state: FSMContext, user_id: int, rate_command: str):
+    """Rate last shown fact without waiting for API response"""
     async with state.proxy() as data:
-        data['last_rated_topic_name'] = random_fact_title
-    await process_showing_main_menu(bot, message, f'{random_fact_title}\n\n{random_fact}')
+        title_id = data.get('last_rated_title_id')
+    run_in_background(user_id, api_backend.rate_fact(state, rate_command, title_id))
+
+
+def run_in_background(user_id: int, api_call: Awaitable):
+    """Make API call in background after previous background calls of user, so calls of one user keep order"""
+    task = asyncio.create_task(_run_after(background_tasks.get(user_id), api_call))
+    background_tasks[user_id] = task
+    task.add_done_callback(functools.partial(_forget_background_task, user_id))
+
+
+async def wait_for_background_tasks(user_id: int):
+    task = background_tasks.get(user_id)
+    if task is not None:
+        await asyncio.wait([task])
+
+
+async def _run_after(previous_task: Optional[asyncio.Task], api_call: Awaitable):
+    if previous_task is not None:
+        await asyncio.wait([previous_task])
+    try:
+        await api_call
+    except Exception as error:
+        logger.exception(f'Background API call failed: {error!r}')
+
+
+def _forget_background_task(user_id: int, task: asyncio.Task):
+    if background_tasks.get(user_id) is task:
+        del background_tasks[user_id]
 
 
 async def process_showing_main_menu(bot: Bot, message: types.CallbackQuery, text: str):
@@ -40,30 +89,6 @@ async def process_showing_main_menu(bot: Bot, message: types.CallbackQuery, text
     )
 
 
-async def rate_fact(state: FSMContext, rate_command: str):
-    """Process http request to rate random fact"""
-    async with state.proxy() as data:
-        session_key = data['session_key']
-    session = ClientSession(cookies={'PROCRASTINATION_SESSION': session_key}, json_serialize=ujson.dumps)
-    async with session.post(URL.RATE_FACT.value, json={'command': rate_command}):
-        await session.close()
-
-
-async def get_random_rated_fact(state: FSMContext, search_type: str) -> tuple[str, str]:
-    """Process Http request to get random rated fact"""
-    if search_type == CurrentTask.GET_NEW_FACT:
-        url = URL.RANDOM_RATED_FACT.value + SearchType.NEW_FACTS.value
-    else:
-        url = URL.RANDOM_RATED_FACT.value + SearchType.TOP_FACTS.value
-    async with state.proxy() as data:
-        session_key = data['session_key']
-    session = ClientSession(cookies={'PROCRASTINATION_SESSION': session_key})
-    async with session.get(url) as response:
-        result = await response.json(loads=ujson.loads)
-        await session.close()
-    return result['random_rated_fact'], result['title_name']
-
-
 async def process_authorization_error_scenario(
         message: types.Message,
         response: Union[dict[str], str],
@@ -117,39 +142,6 @@ async def process_successful_authorization(message: types.Message, authorization
     await MainForm.work_process.set()
 
 
-async def register_user(user_info: dict[str]) -> tuple[Union[dict[str], str], bool]:
-    """Process Http request to api to register user"""
-    session = ClientSession(json_serialize=ujson.dumps)
-    async with session.post(URL.REGISTER.value, json=user_info) as response:
-        content_type = response.content_type
-        if content_type != ContentType.JSON.value:
-            successful = False
-            error_text = await response.text()
-            return error_text, successful
-        result = await response.json(loads=ujson.loads)
-        await session.close()
-    if 'result' in result.keys() and result['result'] == 500:
-        successful = True
-        return result, successful
-    successful = False
-    return result, successful
-
-
-async def login_user(user_info: dict[str], state: FSMContext) -> tuple[dict[str], bool]:
-    """Process Http request to login user"""
-    session = ClientSession(json_serialize=ujson.dumps)
-    async with session.post(URL.LOGIN.value, json=user_info) as response:
-        result = await response.json(loads=ujson.loads)
-        await session.close()
-    if 'result' in result.keys() and result['result'] == 500:
-        successful = True
-        async with state.proxy() as data:
-            data['session_key'] = response.cookies['PROCRASTINATION_SESSION']
-        return result, successful
-    successful = False
-    return result, successful
-
-
 def create_inline_keyboard(buttons: list[str],
                            callback_queries: Optional[tuple] = None,
                            ) -> types.InlineKeyboardMarkup:
@@ -0,0 +1,175 @@
+"""Receiving bot updates by webhook"""
+import asyncio
+import hmac
+import time
+import typing
+
+import ujson
+from aiogram import Bot, Dispatcher, types
+from aiohttp import web
+from loguru import logger
+
+from bot.constants import bot, dp
+from bot.main import on_startup, on_shutdown
+from shared.constants import WebhookSettings
+from shared.project_settings import settings
+from shared.utilities import create_webhook_secret, create_webhook_path
+
+
+class UpdateWorkerPool:
+    """Bounded pool of workers processing updates, updates of one chat always go to one worker and keep order"""
+
+    def __init__(self, dispatcher: Dispatcher, workers: int, queue_size: int, shutdown_timeout: float):
+        self.dispatcher = dispatcher
+        self.workers = workers
+        self.queue_size = queue_size  # Max amount of waiting updates per worker, next ones wait for free place
+        self.shutdown_timeout = shutdown_timeout
+        self.accepted = 0
+        self.delayed = 0  # Updates which waited for free place in full worker queue
+        self.max_delay_time = 0.0
+        self.processed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        """Start workers"""
+        self._queues = [asyncio.Queue(self.queue_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._run(queue)) for queue in self._queues]
+
+    async def stop(self):
+        """Process accepted updates if it's possible in shutdown timeout and stop workers"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f'{self.get_queue_depth()} updates were not processed before shutdown')
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, update: types.Update):
+        """Queue update to its chat worker, wait for free place if worker is overloaded.
+
+        Update isn't rejected, so telegram doesn't redeliver it after later updates of the chat.
+        Telegram doesn't send more updates while it waits for answers, so waiting slows it down.
+        """
+        queue = self._queues[get_chat_id(update) % self.workers]
+        if queue.full():
+            self.delayed += 1
+            started = time.monotonic()
+            await queue.put((time.monotonic(), update))
+            self.max_delay_time = max(self.max_delay_time, time.monotonic() - started)
+        else:
+            queue.put_nowait((time.monotonic(), update))
+        self.accepted += 1
+        self.max_queue_depth = max(self.max_queue_depth, queue.qsize())
+
+    def get_queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    def get_stats(self) -> dict[str, typing.Union[int, float]]:
+        """Get processing and backpressure metrics"""
+        started = self.processed + self.failed
+        return {
+            'queue_depth': self.get_queue_depth(),
+            'max_queue_depth': self.max_queue_depth,
+            'accepted': self.accepted,
+            'delayed': self.delayed,
+            'max_delay_time': self.max_delay_time,
+            'processed': self.processed,
+            'failed': self.failed,
+            'avg_wait_time': self.total_wait_time / started if started else 0.0,
+            'max_wait_time': self.max_wait_time,
+        }
+
+    async def _run(self, queue: asyncio.Queue):
+        Dispatcher.set_current(self.dispatcher)
+        Bot.set_current(self.dispatcher.bot)
+        while True:
+            queued_at, update = await queue.get()
+            wait_time = time.monotonic() - queued_at
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            try:
+                await self.dispatcher.process_update(update)
+                self.processed += 1
+            except Exception as error:
+                self.failed += 1
+                logger.exception(f'Processing of update {update.update_id} failed: {error!r}')
+            finally:
+                queue.task_done()
+
+
+def get_chat_id(update: types.Update) -> int:
+    """Get id of chat or user update belongs to"""
+    for message in (update.message, update.edited_message, update.channel_post, update.edited_channel_post):
+        if message is not None:
+            return message.chat.id
+    for event in (update.callback_query, update.inline_query, update.chosen_inline_result):
+        if event is not None:
+            return event.from_user.id
+    return update.update_id
+
+
+async def process_webhook_update(request: web.Request) -> web.Response:
+    """Accept update from telegram, only requests to path with secret made of bot token are accepted"""
+    if not hmac.compare_digest(request.match_info['secret'], create_webhook_secret(settings.telegram_token)):
+        raise web.HTTPForbidden()
+    try:
+        update = types.Update(**await request.json(loads=ujson.loads))
+    except (ValueError, TypeError):
+        raise web.HTTPBadRequest(text='Incorrect update')
+    await request.app['update_worker_pool'].submit(update)
+    return web.Response()
+
+
+def setup_webhook(app: web.Application, path: str = settings.webhook_path):
+    """Add webhook route to app and tie bot lifecycle to app lifecycle, app can be api app or standalone one.
+
+    Route path ends with secret made of bot token, so forged updates can't be posted by anyone who knows the path.
+    """
+    app['update_worker_pool'] = UpdateWorkerPool(
+        dp,
+        workers=WebhookSettings.WORKERS.value,
+        queue_size=WebhookSettings.QUEUE_SIZE.value,
+        shutdown_timeout=WebhookSettings.SHUTDOWN_TIMEOUT.value,
+    )
+    app.router.add_post(path.rstrip('/') + '/{secret}', process_webhook_update)
+    app['webhook_path'] = path
+    app.on_startup.append(on_webhook_startup)
+    app.on_cleanup.append(on_webhook_cleanup)
+
+
+async def on_webhook_startup(app: web.Application):
+    await on_startup(dp)
+    app['update_worker_pool'].start()
+    if settings.webhook_url:
+        logger.info(f'Setting bot webhook to {settings.webhook_url}{app["webhook_path"]}')
+        await bot.set_webhook(
+            settings.webhook_url.rstrip('/') + create_webhook_path(app['webhook_path'], settings.telegram_token)
+        )
+
+
+async def on_webhook_cleanup(app: web.Application):
+    logger.info('Processing accepted bot updates')
+    await app['update_worker_pool'].stop()
+    logger.info(f'Bot updates processing stats: {app["update_worker_pool"].get_stats()}')
+    await on_shutdown(dp)
+    await (await bot.get_session()).close()
+
+
+def webhook_app() -> web.Application:
+    """Start standalone webhook app entrypoint"""
+    app = web.Application()
+    setup_webhook(app)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(webhook_app(), port=WebhookSettings.PORT.value)
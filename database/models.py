@@ -1,15 +1,63 @@
 """DB entities"""
+import datetime
+import time
 import typing
 
-from random import randint
-
 import sqlalchemy as sa
 from gino import Gino
-from sqlalchemy import and_
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.postgresql import insert
 
-from database.utilities import CategoryRating, parse_results, get_required_categories
+from database.utilities import CategoryRating, TitlesIdsIndex
+from shared.constants import CategoriesCacheSettings
 
 db = Gino()  # DB initialization
+titles_ids_index = TitlesIdsIndex()
+
+RATE_TITLE_QUERY = sa.text(
+    """
+    WITH rated_title AS (
+        UPDATE titles SET
+            amount_of_likes = amount_of_likes + CAST(:likes_difference AS INTEGER),
+            amount_of_views = amount_of_views + 1,
+            title_rating = (amount_of_likes + CAST(:likes_difference AS INTEGER)) / (amount_of_views + 1)
+        WHERE id = :title_id
+        RETURNING title_type_id
+    )
+    INSERT INTO ratings (category_type_id, user_id, rating_number)
+    SELECT title_type_id, CAST(:user_id AS INTEGER), CAST(:likes_difference AS INTEGER) FROM rated_title
+    ON CONFLICT ON CONSTRAINT uq_ratings_user_id_category_type_id
+    DO UPDATE SET rating_number = ratings.rating_number + EXCLUDED.rating_number
+    RETURNING category_type_id
+    """
+)
+RATE_TITLES_QUERY = sa.text(
+    """
+    UPDATE titles SET
+        amount_of_likes = titles.amount_of_likes + rates.likes_difference,
+        amount_of_views = titles.amount_of_views + rates.amount_of_views,
+        title_rating = (titles.amount_of_likes + rates.likes_difference)
+            / (titles.amount_of_views + rates.amount_of_views)
+    FROM unnest(
+        CAST(:titles_ids AS INTEGER[]),
+        CAST(:likes_differences AS INTEGER[]),
+        CAST(:amounts_of_views AS INTEGER[])
+    ) AS rates (id, likes_difference, amount_of_views)
+    WHERE titles.id = rates.id
+    """
+)
+RATE_CATEGORIES_QUERY = sa.text(
+    """
+    INSERT INTO ratings (user_id, category_type_id, rating_number)
+    SELECT * FROM unnest(
+        CAST(:users_ids AS INTEGER[]),
+        CAST(:categories_ids AS INTEGER[]),
+        CAST(:rating_differences AS INTEGER[])
+    )
+    ON CONFLICT ON CONSTRAINT uq_ratings_user_id_category_type_id
+    DO UPDATE SET rating_number = ratings.rating_number + EXCLUDED.rating_number
+    """
+)
 
 
 async def connect_to_db(uri: str):
@@ -32,21 +80,16 @@ class User(db.Model):
             amount_of_categories: int,
             user_id: int,
     ) -> list['CategoryRating']:
-        """Get users top categories"""
-        all_categories_ids = await Category.get_all_available_categories_ids()
-        rated_categories = await db.select(
-            [Rating.category_type_id, Rating.rating_number]
-        ).select_from(
-            cls.join(Rating)
-        ).gino.query.where(
-            and_(
-                Rating.rating_number >= 0,
-                cls.id == user_id,
-            )
+        """Get users top categories, unrated ones count as zero rated"""
+        rating_number = sa.func.coalesce(Rating.rating_number, 0)
+        categories = await cls._select_categories_with_ratings(
+            user_id,
+            rating_number,
         ).order_by(
-            Rating.rating_number
-        ).gino.all()
-        return parse_results(amount_of_categories, rated_categories, all_categories_ids)
+            rating_number.desc(),
+            sa.func.random(),  # Shuffle categories with equal rating
+        ).limit(amount_of_categories).gino.all()
+        return [CategoryRating(category_id, rating) for category_id, rating in categories]
 
     @classmethod
     async def get_new_users_categories_id(
@@ -54,35 +97,35 @@ class User(db.Model):
             amount_of_categories: int,
             user_id: int,
     ) -> list['CategoryRating']:
-        """Get users new categories"""
-        all_categories_ids = await Category.get_all_available_categories_ids()
-        unparsed_unrated_categories_ids = await db.select(
-            [
-                Rating.category_type_id,
-                Rating.rating_number,
-            ]
-        ).select_from(
-            cls.join(Rating)
-        ).gino.query.where(
-            cls.id == user_id
-        ).gino.all()
-        if len(all_categories_ids) - len(unparsed_unrated_categories_ids) >= amount_of_categories:
-            result = []
-            get_required_categories(unparsed_unrated_categories_ids, all_categories_ids, amount_of_categories)
-            for unparsed_category in unparsed_unrated_categories_ids:
-                result.append(CategoryRating(unparsed_category[0], 0))
-            return result
-        zero_rated_categories = await db.select(
-            [Rating.category_type_id, Rating.rating_number]
+        """Get users new categories: unrated at first, then the closest to zero rated"""
+        rating_number = sa.func.coalesce(Rating.rating_number, 0)
+        categories = await cls._select_categories_with_ratings(
+            user_id,
+            rating_number,
+        ).order_by(
+            Rating.id.isnot(None),
+            sa.func.abs(rating_number),
+            sa.func.random(),
+        ).limit(amount_of_categories).gino.all()
+        return [CategoryRating(category_id, rating) for category_id, rating in categories]
+
+    @staticmethod
+    def _select_categories_with_ratings(
+            user_id: int,
+            rating_number: sa.sql.expression.ColumnElement,
+    ) -> sa.sql.expression.Select:
+        """Select all categories left joined with user's ratings of them"""
+        return db.select(
+            [Category.id, rating_number]
         ).select_from(
-            cls.join(Rating)
-        ).gino.query.where(
-            and_(
-                Rating.rating_number == 0,
-                cls.id == user_id,
+            Category.outerjoin(
+                Rating,
+                and_(
+                    Rating.category_type_id == Category.id,
+                    Rating.user_id == user_id,
+                ),
             )
-        ).gino.all()
-        return parse_results(amount_of_categories, zero_rated_categories, all_categories_ids)
+        )
 
     @classmethod
     async def get_user_by_username(cls, username: str) -> typing.Optional['User']:
@@ -123,6 +166,7 @@ class Category(db.Model):
 
     id = sa.Column(sa.Integer(), primary_key=True)
     category_name = sa.Column(sa.String(80), unique=True, nullable=False)
+    amount_of_titles = sa.Column(sa.Integer(), server_default='0', nullable=False)  # Kept by titles triggers
 
     @classmethod
     async def get_category_by_name(cls, category_name: str) -> typing.Optional['Category']:
@@ -130,18 +174,26 @@ class Category(db.Model):
         category = await cls.query.where(cls.category_name == category_name).gino.one_or_none()
         return category
 
+    _categories_ids_cache: typing.Optional[tuple[float, list[int]]] = None  # (expiration time, categories ids)
+
     @classmethod
     async def get_all_available_categories_ids(cls) -> list[int]:
-        """Get list with all available categories in db"""
+        """Get list with all available categories in db, cached since categories are almost never changed"""
+        if cls._categories_ids_cache is not None and cls._categories_ids_cache[0] > time.monotonic():
+            return cls._categories_ids_cache[1]
         result = []
         categories = await cls.select('id').gino.all()
         for data in categories:
             result.append(data[0])
+        cls._categories_ids_cache = (time.monotonic() + CategoriesCacheSettings.TTL.value, result)
         return result
 
 
 class Rating(db.Model):
     __tablename__ = 'ratings'
+    __table_args__ = (
+        sa.UniqueConstraint('user_id', 'category_type_id', name='uq_ratings_user_id_category_type_id'),
+    )
 
     id = sa.Column(sa.Integer(), primary_key=True)
     category_type_id = sa.Column(sa.Integer(), sa.ForeignKey(Category.id, ondelete='CASCADE'), nullable=False)
@@ -163,6 +215,11 @@ class Rating(db.Model):
 
 class Title(db.Model):
     __tablename__ = 'titles'
+    __table_args__ = (
+        sa.UniqueConstraint('title_type_id', 'title_name', name='uq_titles_title_type_id_title_name'),
+        sa.Index('ix_titles_title_type_id_id', 'title_type_id', 'id'),
+        sa.Index('ix_titles_title_type_id_position', 'title_type_id', 'position', unique=True),
+    )
 
     id = sa.Column(sa.Integer(), primary_key=True)
     title_type_id = sa.Column(sa.Integer(), sa.ForeignKey(Category.id, ondelete='CASCADE'), nullable=False)
@@ -170,25 +227,166 @@ class Title(db.Model):
     title_rating = sa.Column(sa.Float(), default=0, nullable=False)
     amount_of_likes = sa.Column(sa.Float(), default=0, nullable=False)
     amount_of_views = sa.Column(sa.Integer(), default=0, nullable=False)
+    extract = sa.Column(sa.Text(), nullable=True)
+    extract_fetched_at = sa.Column(sa.DateTime(), nullable=True, index=True)
+    position = sa.Column(sa.Integer(), nullable=True)  # Dense number of title in category set by db triggers
+
+    @classmethod
+    async def create_titles(cls, title_type_id: int, titles_names: list[str]) -> int:
+        """Insert titles of one category by one statement skipping existing ones, return amount of inserted"""
+        if not titles_names:
+            return 0
+        status, _ = await db.status(
+            insert(cls.__table__).values(
+                [
+                    {
+                        'title_type_id': title_type_id,
+                        'title_name': title_name,
+                        'title_rating': 0,
+                        'amount_of_likes': 0,
+                        'amount_of_views': 0,
+                    }
+                    for title_name in dict.fromkeys(titles_names)
+                ]
+            ).on_conflict_do_nothing(
+                constraint='uq_titles_title_type_id_title_name',
+            )
+        )
+        return int(status.split()[-1])  # Status looks like 'INSERT 0 <amount of inserted rows>'
+
+    @classmethod
+    async def apply_rate(cls, title_id: int, user_id: int, likes_difference: int) -> typing.Optional[int]:
+        """Count title view with likes difference and change user's rating of title category by one statement
+
+        Counters are changed on db side so concurrent rates don't overwrite each other.
+        Return title category id or None if title doesn't exist.
+        """
+        category_id = await db.scalar(
+            RATE_TITLE_QUERY,
+            title_id=title_id,
+            user_id=user_id,
+            likes_difference=likes_difference,
+        )
+        return category_id
+
+    @classmethod
+    async def apply_rates(
+            cls,
+            titles_rates: dict[int, tuple[int, int]],
+            categories_rates: dict[tuple[int, int], int],
+    ):
+        """Apply coalesced rates in one transaction
+
+        titles_rates: title id -> (likes difference, amount of views)
+        categories_rates: (user id, category id) -> rating difference
+        """
+        async with db.transaction():
+            if titles_rates:
+                await db.status(
+                    RATE_TITLES_QUERY,
+                    titles_ids=list(titles_rates.keys()),
+                    likes_differences=[likes_difference for likes_difference, _ in titles_rates.values()],
+                    amounts_of_views=[amount_of_views for _, amount_of_views in titles_rates.values()],
+                )
+            if categories_rates:
+                await db.status(
+                    RATE_CATEGORIES_QUERY,
+                    users_ids=[user_id for user_id, _ in categories_rates.keys()],
+                    categories_ids=[category_id for _, category_id in categories_rates.keys()],
+                    rating_differences=list(categories_rates.values()),
+                )
 
     @classmethod
     async def get_amount_of_titles_by_type(cls, title_type: int) -> int:
         """Get all amount of titles by its category"""
-        amount_of_titles = await cls.select().where(cls.title_type_id == title_type).count().gino.scalar()
-        return amount_of_titles
+        amount_of_titles = titles_ids_index.get_amount(title_type)
+        if amount_of_titles is not None:
+            return amount_of_titles
+        amount_of_titles = await Category.select('amount_of_titles').where(Category.id == title_type).gino.scalar()
+        return amount_of_titles or 0
 
     @classmethod
-    async def get_all_titles_id_by_category(cls, title_type: int) -> list[int]:
-        """Get all title ids for one category"""
-        result = []
-        raw_result = await cls.select('id').where(cls.title_type_id == title_type).gino.all()
-        for data in raw_result:
-            result.append(data[0])
-        return result
+    async def refresh_titles_ids_index(cls, full: bool = False, batch_size: int = 50000) -> int:
+        """Load ids of titles added since last refresh into in-memory index, return amount of loaded
+
+        Titles committed out of ids order are below last indexed id, so they are loaded only by full reload,
+        which builds new index aside and swaps it in.
+        """
+        index = TitlesIdsIndex() if full else titles_ids_index
+        amount_of_loaded = 0
+        while True:
+            titles = await db.select(
+                [cls.id, cls.title_type_id]
+            ).where(
+                cls.id > index.last_id
+            ).order_by(
+                cls.id
+            ).limit(batch_size).gino.all()
+            index.add(titles)
+            amount_of_loaded += len(titles)
+            if len(titles) < batch_size:
+                titles_ids_index.replace(index)
+                return amount_of_loaded
 
     @classmethod
-    async def get_random_title_by_category(cls, title_type: int) -> 'Title':
-        """Get one title by its category"""
-        title_ids = await cls.get_all_titles_id_by_category(title_type)
-        title = await cls.get(title_ids[randint(0, len(title_ids)-1)])
+    async def get_random_title_by_category(cls, title_type: int) -> typing.Optional['Title']:
+        """Get random title of category using in-memory ids index if it's loaded"""
+        title_id = titles_ids_index.get_random_id(title_type)
+        if title_id is not None:
+            title = await cls.get(title_id)
+            if title is not None:
+                return title
+        return await cls.select_random_title_by_category(title_type)
+
+    @classmethod
+    async def select_random_title_by_category(cls, title_type: int) -> typing.Optional['Title']:
+        """Get random title of category by one query, None if category has no titles
+
+        Titles of category have dense positions, so random position is taken from amount of category titles
+        and title is found by it in (title_type_id, position) unique index, cost doesn't depend on amount of titles.
+        """
+        picked = sa.select([
+            Category.id.label('category_id'),
+            sa.cast(sa.func.floor(sa.func.random() * Category.amount_of_titles), sa.Integer()).label('position'),
+        ]).where(
+            Category.id == title_type
+        ).alias('picked')  # Subquery with random() isn't flattened, so random position is taken once
+        title = await cls.query.select_from(
+            cls.__table__.join(
+                picked,
+                and_(cls.title_type_id == picked.c.category_id, cls.position == picked.c.position),
+            )
+        ).gino.first()
         return title
+
+    @classmethod
+    async def get_titles_to_prefetch(cls, fetched_before: datetime.datetime, amount: int) -> list['Title']:
+        """Get titles without extract or with extract fetched before required time"""
+        titles = await cls.query.where(
+            or_(
+                cls.extract_fetched_at.is_(None),
+                cls.extract_fetched_at < fetched_before,
+            )
+        ).order_by(
+            cls.extract_fetched_at.nullsfirst()
+        ).limit(amount).gino.all()
+        return titles
+
+    @classmethod
+    async def update_extracts(cls, extracts: dict[int, str]):
+        """Write fetched extracts into db by titles ids in one statement"""
+        if not extracts:
+            return
+        fetched_at = datetime.datetime.utcnow()
+        await db.status(
+            cls.update.where(
+                cls.id == sa.bindparam('title_id')
+            ).values(
+                extract=sa.bindparam('title_extract'),
+                extract_fetched_at=fetched_at,
+            ),
+            [
+                {'title_id': title_id, 'title_extract': extract}
+                for title_id, extract in extracts.items()
+            ],
+        )
@@ -1,9 +1,10 @@
-from typing import Optional, Union
+import random
+from array import array
+from typing import Optional, Iterable
 from dataclasses import dataclass
 import alembic.command
 import alembic.config
 from loguru import logger
-from sqlalchemy.engine import RowProxy
 from shared.project_settings import ProjectSettings
 
 
@@ -13,6 +14,39 @@ class CategoryRating:
     rating_number: int
 
 
+class TitlesIdsIndex:
+    """Process-wide in-memory index of titles ids by their category id"""
+
+    def __init__(self):
+        self.ids_by_category: dict[int, array] = {}
+        self.last_id = 0  # Max indexed title id, titles with greater ids are loaded on refresh
+        self.loaded = False
+
+    def add(self, titles: Iterable[tuple[int, int]]):
+        """Add (title id, category id) pairs to index"""
+        for title_id, category_id in titles:
+            self.ids_by_category.setdefault(category_id, array('i')).append(title_id)
+            self.last_id = max(self.last_id, title_id)
+
+    def replace(self, index: 'TitlesIdsIndex'):
+        """Replace content of index by fully loaded one"""
+        self.ids_by_category, self.last_id = index.ids_by_category, index.last_id
+        self.loaded = True
+
+    def get_random_id(self, category_id: int) -> Optional[int]:
+        """Get random title id of category if there are indexed ones"""
+        ids = self.ids_by_category.get(category_id)
+        if not ids:
+            return None
+        return ids[random.randrange(len(ids))]
+
+    def get_amount(self, category_id: int) -> Optional[int]:
+        """Get amount of titles of category, None if index isn't loaded yet"""
+        if not self.loaded:
+            return None
+        return len(self.ids_by_category.get(category_id, ()))
+
+
 def apply_migrations(settings: ProjectSettings):
     """Apply migrations based on project settings"""
     alembic_config = alembic.config.Config('alembic.ini')
@@ -22,41 +56,3 @@ def apply_migrations(settings: ProjectSettings):
         settings.create_db_uri(),
     )
     alembic.command.upgrade(alembic_config, settings.apply_migration)
-
-
-
-def get_required_categories(
-        rated_categories: Optional[list['RowProxy']],
-        all_available_categories_ids: list[int],
-        amount_of_categories: int
-) -> list[int]:
-    """Get all unrated categories"""
-    if not rated_categories:
-        return all_available_categories_ids[amount_of_categories:]
-    result = [
-        category_id for (rated_category_id, _) in rated_categories
-        for category_id in all_available_categories_ids
-        if rated_category_id != category_id
-    ]
-    return result[amount_of_categories:]
-
-
-def parse_results(
-        amount_of_categories: int,
-        rated_categories: Optional[list['RowProxy']],
-        all_categories_ids: list[int],
-) -> list['CategoryRating']:
-    """Process parsing results and getting additional categories if needed"""
-    result: list['CategoryRating'] = []
-    if len(rated_categories) < amount_of_categories:
-        unrated_categories = get_required_categories(
-            rated_categories,
-            all_categories_ids,
-            amount_of_categories - len(rated_categories),
-        )
-        for unrated_category_id in unrated_categories:
-            rated_categories.append((unrated_category_id, 0))
-    while len(result) < amount_of_categories:
-        for (category_id, category_rating) in rated_categories:
-            result.append(CategoryRating(category_id, category_rating))
-    return result
@@ -36,6 +36,7 @@ class RequiredData(enum.Enum):
     EMAIL = 'email'
     TELEGRAM_ID = 'telegram_id'
     COMMAND = 'command'
+    TITLE_ID = 'title_id'
 
 
 class CurrentTask(enum.Enum):
@@ -47,6 +48,55 @@ class CurrentTask(enum.Enum):
     GET_NEW_FACT = 'Get new facts'
 
 
+class PasswordExecutorType(enum.Enum):
+    """Where bcrypt work is processed"""
+    INLINE = 'inline'  # In event loop
+    THREAD = 'thread'
+    PROCESS = 'process'
+
+
+class FSMStorageType(enum.Enum):
+    """Where bot conversations state is kept"""
+    MEMORY = 'memory'  # Only for one bot process, state is lost on restart
+    REDIS = 'redis'
+
+
+class FSMStorageSettings(enum.Enum):
+    """Redis storage of bot conversations state"""
+    REDIS_HOST = 'procrastination_redis'
+    REDIS_PORT = 6379
+    KEY_PREFIX = 'fsm'
+
+
+class ApiTransportType(enum.Enum):
+    """How bot uses API"""
+    HTTP = 'http'
+    IN_PROCESS = 'in_process'  # API services are called in bot process
+
+
+class WebhookSettings(enum.Enum):
+    """Bot updates processing settings in webhook mode"""
+    WORKERS = 16  # Updates of one chat are processed by one worker in order
+    QUEUE_SIZE = 100  # Updates waiting for one worker, next ones wait for free place before answer to telegram
+    SHUTDOWN_TIMEOUT = 10  # seconds
+    PORT = 8001  # Port of standalone webhook app
+
+
+class MailTransportType(enum.Enum):
+    """How mails are delivered"""
+    SMTP = 'smtp'
+    MEMORY = 'memory'  # Mails are only logged and kept in memory
+
+
+class MailerSettings(enum.Enum):
+    """Outgoing mails queue settings"""
+    QUEUE_SIZE = 1000
+    MAX_ATTEMPTS = 5
+    RETRY_DELAY = 1  # seconds before the first retry, doubled for next ones
+    SHUTDOWN_TIMEOUT = 10  # seconds to deliver queued mails on shutdown
+    SMTP_TIMEOUT = 30  # seconds
+
+
 class URL(enum.Enum):
     """Urls for accessing API"""
     REGISTER = 'http://procrastination_web:8000/registration'
@@ -57,6 +107,14 @@ class URL(enum.Enum):
     EMAIL_CONFIRMATION = 'http://0.0.0.0:8000/email_confirmation/'
 
 
+class ApiClientSettings(enum.Enum):
+    """Settings of bot http client used for API"""
+    CONNECTIONS_LIMIT = 100
+    KEEPALIVE_TIMEOUT = 60  # seconds
+    REQUEST_TIMEOUT = 30  # seconds
+    SESSION_COOKIE = 'PROCRASTINATION_SESSION'
+
+
 class InfoTypeId(enum.Enum):
     """Info category id"""
     PHYSICS = 0
@@ -106,6 +164,99 @@ class Wiki(enum.Enum):
     WIKI_URL = 'https://en.wikipedia.org/wiki/'
 
 
+class WikiApiLimits(enum.Enum):
+    """Wiki api limits for one request"""
+    EXTRACTS_PER_REQUEST = 20  # Max exlimit when only intro is requested
+
+
+class WikiClientSettings(enum.Enum):
+    """Connection pool settings of http client used for wiki api"""
+    CONNECTIONS_LIMIT = 100
+    CONNECTIONS_LIMIT_PER_HOST = 30
+    DNS_CACHE_TTL = 300  # seconds
+    KEEPALIVE_TIMEOUT = 30  # seconds
+    STREAM_CHUNK_SIZE = 64 * 1024  # bytes
+
+
+class WikiThrottlingSettings(enum.Enum):
+    """Limits of requests to wiki api shared by all searchers"""
+    RATE = 50  # Requests per second
+    BURST = 50
+    MAX_CONCURRENCY = 20
+    MAXLAG = 5  # seconds of db replication lag when wiki api asks to retry later
+    MAX_ATTEMPTS = 3  # Attempts to make request if wiki api asks to retry later
+    DEFAULT_RETRY_AFTER = 5  # seconds
+
+
+class WikiResilienceSettings(enum.Enum):
+    """Timeouts, retries and circuit breaker settings of wiki api requests"""
+    REQUEST_TIMEOUT = 10  # seconds
+    CALL_DEADLINE = 20  # seconds for whole call including throttling waits and retries
+    MAX_ATTEMPTS = 3
+    RETRY_DELAY = 0.2  # seconds before the first retry, doubled for next ones
+    FAILURE_THRESHOLD = 5  # Consecutive failed requests to open circuit breaker
+    RECOVERY_TIMEOUT = 30  # seconds of open circuit breaker before trial request
+
+
+class ExtractCacheSettings(enum.Enum):
+    """Wiki extracts cache settings"""
+    MAX_ENTRIES = 10000
+    MAX_SIZE = 20_000_000  # Summary length of cached extracts in local tier
+    LOCAL_TTL = 60 * 60  # seconds
+    REDIS_TTL = 7 * 24 * 60 * 60  # seconds
+    REDIS_KEY_PREFIX = 'wiki_extract:'
+
+
+class ExtractPrefetchSettings(enum.Enum):
+    """Background titles extracts prefetching settings"""
+    BATCH_SIZE = 100
+    REFRESH_PERIOD_DAYS = 30
+    IDLE_DELAY = 60  # seconds to wait when there is nothing to prefetch
+
+
+class CategoriesCacheSettings(enum.Enum):
+    """Available categories list cache settings"""
+    TTL = 10 * 60  # seconds
+
+
+class TitlesIndexSettings(enum.Enum):
+    """In-memory titles ids index settings"""
+    REFRESH_PERIOD = 60  # seconds between loading of new titles
+    FULL_RELOAD_PERIOD = 900  # seconds between full reloads picking up titles committed out of ids order
+
+
+class RatingBufferSettings(enum.Enum):
+    """Write-behind rates buffer settings"""
+    FLUSH_INTERVAL = 0.5  # seconds
+    MAX_AMOUNT_OF_EVENTS = 1000  # Buffered rates to flush before interval is over
+    REDIS_KEY = 'rating_buffer:pending'
+    REJECTED_REDIS_KEY = 'rating_buffer:rejected'  # Rates db refused to apply, kept for manual inspection
+
+
+class ServedTitlesSettings(enum.Enum):
+    """Titles recently served to user which can be rated by id"""
+    MAX_AMOUNT = 10
+    SESSION_KEY = 'served_titles'
+
+
+class RandomFactSettings(enum.Enum):
+    """Random fact searching settings"""
+    PAGES_PER_FACT = 3  # Random pages requested for one fact since some of them have no intro
+    MAX_REQUESTS = 3  # Requests of random pages for batch of facts
+
+
+class RatedFactSettings(enum.Enum):
+    """Random rated fact searching settings"""
+    MAX_ATTEMPTS = 3  # Random titles to try when chosen ones have no wiki extract
+
+
+class FactPoolSettings(enum.Enum):
+    """Ready to serve facts pool settings"""
+    CAPACITY = 20  # Facts per category
+    LOW_WATER_MARK = 5  # Amount of facts when queue refilling starts
+    REFILL_BATCH_SIZE = 10
+
+
 class SearchedObjectCategories(enum.Enum):
     """Category objects to search in wiki"""
     PHYSICS = 'Category:Physics'
@@ -121,6 +272,18 @@ class SearchedObjectCategories(enum.Enum):
     JURISPRUDENCE = 'Category:Jurisprudence'
 
 
+class WikiNamespace(enum.Enum):
+    """Wiki namespaces ids"""
+    PAGE = 0
+    CATEGORY = 14
+
+
+class CategoryCrawlSettings(enum.Enum):
+    """Settings of crawling over categories tree to fill titles"""
+    MAX_DEPTH = 2  # Levels of subcategories to descend into
+    TITLES_BATCH_SIZE = 500
+
+
 class SearchedObjectTypes(enum.Enum):
     """Existing object types to search in wiki"""
     TITLE = 'title'
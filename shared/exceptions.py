@@ -22,3 +22,19 @@ class AuthorizationError(ProcrastinationError):
 
 class EmailError(ProcrastinationError):
     pass
+
+
+class IncorrectDataError(ProcrastinationError):
+    pass
+
+
+class ServiceUnavailableError(ProcrastinationError):
+
+    def __str__(self):
+        return f'Service is unavailable now: {self.error_message}'
+
+
+class WikiUnavailableError(ServiceUnavailableError):
+
+    def __str__(self):
+        return f'Wikipedia is unavailable now: {self.error_message}'
@@ -18,6 +18,19 @@ class ProjectSettings(BaseModel):
     service_account_password: str
     service_account_name: str
     smtp_server: str
+    rating_write_behind: bool = False
+    password_executor: str = 'thread'
+    password_workers: int = 4
+    smtp_port: int = 465
+    smtp_use_ssl: bool = True
+    mail_transport: str = 'smtp'
+    fsm_storage: str = 'memory'
+    fsm_ttl: int = 7 * 24 * 60 * 60
+    webhook_url: str = ''
+    webhook_path: str = '/telegram_webhook'
+    bot_webhook_in_api: bool = False
+    telegram_api_server: str = ''
+    bot_api_transport: str = 'http'
 
     project_dir = pathlib.Path(__file__).parent.parent.resolve()
 
@@ -38,6 +51,19 @@ class ProjectSettings(BaseModel):
             service_account_password=config.get('service_account_password'),
             service_account_name=config.get('service_account_name'),
             smtp_server=config.get('smtp_server'),
+            rating_write_behind=config.get('rating_write_behind', False),
+            password_executor=config.get('password_executor', 'thread'),
+            password_workers=config.get('password_workers', 4),
+            smtp_port=config.get('smtp_port', 465),
+            smtp_use_ssl=config.get('smtp_use_ssl', True),
+            mail_transport=config.get('mail_transport', 'smtp'),
+            fsm_storage=config.get('fsm_storage', 'memory'),
+            fsm_ttl=config.get('fsm_ttl', 7 * 24 * 60 * 60),
+            webhook_url=config.get('webhook_url', ''),
+            webhook_path=config.get('webhook_path', '/telegram_webhook'),
+            bot_webhook_in_api=config.get('bot_webhook_in_api', False),
+            telegram_api_server=config.get('telegram_api_server', ''),
+            bot_api_transport=config.get('bot_api_transport', 'http'),
         )
 
     def create_db_uri(self) -> str:
@@ -1,5 +1,7 @@
+import hashlib
+import random
 from enum import EnumMeta
-from typing import Union
+from typing import Union, Any
 
 
 def get_all_enum_values(
@@ -8,3 +10,59 @@ def get_all_enum_values(
     """Get all enum fields values"""
     value_map = map(lambda x: getattr(x, 'value'), enum.__members__.values())
     return list(value_map)
+
+
+def create_webhook_secret(telegram_token: str) -> str:
+    """Create secret part of bot webhook path, it can't be guessed without bot token"""
+    return hashlib.sha256(f'webhook:{telegram_token}'.encode('utf-8')).hexdigest()
+
+
+def create_webhook_path(base_path: str, telegram_token: str) -> str:
+    return f'{base_path.rstrip("/")}/{create_webhook_secret(telegram_token)}'
+
+
+class AliasTable:
+    """Vose's alias table to choose weighted random item by O(1)"""
+
+    def __init__(self, items: list[Any], probabilities: list[float], aliases: list[int]):
+        self.items = items
+        self.probabilities = probabilities
+        self.aliases = aliases
+
+    @classmethod
+    def from_weights(cls, items: list[Any], weights: list[float]) -> 'AliasTable':
+        """Build alias table for items with positive weights"""
+        if not items or len(items) != len(weights):
+            raise ValueError('Items and weights must be non-empty lists of the same length')
+        amount_of_items = len(items)
+        total_weight = sum(weights)
+        scaled_weights = [weight * amount_of_items / total_weight for weight in weights]
+        probabilities = [1.0] * amount_of_items
+        aliases = list(range(amount_of_items))
+        small = [index for index, weight in enumerate(scaled_weights) if weight < 1]
+        large = [index for index, weight in enumerate(scaled_weights) if weight >= 1]
+        while small and large:
+            small_index, large_index = small.pop(), large.pop()
+            probabilities[small_index], aliases[small_index] = scaled_weights[small_index], large_index
+            scaled_weights[large_index] += scaled_weights[small_index] - 1
+            if scaled_weights[large_index] < 1:
+                small.append(large_index)
+            else:
+                large.append(large_index)
+        return cls(items, probabilities, aliases)  # Left items have probability 1 due to rounding
+
+    @classmethod
+    def from_dict(cls, data: dict[str, list]) -> 'AliasTable':
+        """Restore table from its dict representation"""
+        return cls(data['items'], data['probabilities'], data['aliases'])
+
+    def to_dict(self) -> dict[str, list]:
+        """Get json serializable table representation"""
+        return {'items': self.items, 'probabilities': self.probabilities, 'aliases': self.aliases}
+
+    def choose(self) -> Any:
+        """Choose random item according to weights"""
+        index = random.randrange(len(self.items))
+        if random.random() < self.probabilities[index]:
+            return self.items[index]
+        return self.items[self.aliases[index]]
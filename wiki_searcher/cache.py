@@ -0,0 +1,116 @@
+"""Cache for wiki extracts"""
+import time
+import typing
+from collections import OrderedDict
+
+import aioredis
+from loguru import logger
+
+from shared.constants import ExtractCacheSettings
+
+
+class LRUCache:
+    """In-process LRU cache with ttl, bounded by amount of entries and summary size of values"""
+
+    def __init__(self, max_entries: int, max_size: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_size = max_size  # Summary length of cached values
+        self.ttl = ttl
+        self.size = 0
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> typing.Optional[str]:
+        """Get value if it's cached and not expired"""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        """Cache value evicting least recently used ones if limits are exceeded"""
+        if key in self._data:
+            self._remove(key)
+        if len(value) > self.max_size:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self.size += len(value)
+        while len(self._data) > self.max_entries or self.size > self.max_size:
+            self._remove(next(iter(self._data)))
+
+    def _remove(self, key: str):
+        _, value = self._data.pop(key)
+        self.size -= len(value)
+
+
+class ExtractCache:
+    """Two tier extracts cache keyed by title name: local LRU backed by shared redis"""
+
+    def __init__(self, local_cache: LRUCache, redis_ttl: int, key_prefix: str):
+        self.local_cache = local_cache
+        self.redis_ttl = redis_ttl
+        self.key_prefix = key_prefix
+        self.redis: typing.Optional[aioredis.Redis] = None
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def set_redis(self, redis: typing.Optional[aioredis.Redis]):
+        """Set redis connection for shared tier, without it only local tier is used"""
+        self.redis = redis
+
+    async def get(self, title: str) -> typing.Optional[str]:
+        """Get cached extract of title"""
+        extract = self.local_cache.get(title)
+        if extract is not None:
+            self.local_hits += 1
+            return extract
+        if self.redis is not None:
+            try:
+                extract = await self.redis.get(self.key_prefix + title, encoding='utf-8')
+            except (aioredis.RedisError, OSError) as error:
+                logger.warning(f'Extract cache redis tier is unavailable: {error}')
+            if extract is not None:
+                self.redis_hits += 1
+                self.local_cache.set(title, extract)
+                return extract
+        self.misses += 1
+        return None
+
+    async def set(self, title: str, extract: str):
+        """Cache extract of title in both tiers"""
+        self.local_cache.set(title, extract)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self.key_prefix + title, extract, expire=self.redis_ttl)
+        except (aioredis.RedisError, OSError) as error:
+            logger.warning(f'Extract cache redis tier is unavailable: {error}')
+
+    def get_stats(self) -> dict[str, int]:
+        """Get cache hit/miss counters"""
+        return {
+            'local_hits': self.local_hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'local_entries': len(self.local_cache),
+            'local_size': self.local_cache.size,
+        }
+
+
+extract_cache = ExtractCache(
+    LRUCache(
+        max_entries=ExtractCacheSettings.MAX_ENTRIES.value,
+        max_size=ExtractCacheSettings.MAX_SIZE.value,
+        ttl=ExtractCacheSettings.LOCAL_TTL.value,
+    ),
+    redis_ttl=ExtractCacheSettings.REDIS_TTL.value,
+    key_prefix=ExtractCacheSettings.REDIS_KEY_PREFIX.value,
+)
@@ -0,0 +1,134 @@
+import asyncio
+import collections
+import typing
+from dataclasses import dataclass
+
+from loguru import logger
+
+from database.models import Title, Category
+from shared.constants import FactPoolSettings
+from wiki_searcher.searcher import WikiSearcher
+
+
+@dataclass
+class Fact:
+    title_name: str
+    description: str
+    title_id: typing.Optional[int] = None  # Only facts from titles table have id and category
+    title_type_id: typing.Optional[int] = None
+
+
+class FactPool:
+    """Bounded queues of ready to serve facts per category and for random facts, refilled in background"""
+
+    RANDOM_FACTS = None  # Key of random facts queue
+
+    def __init__(self, capacity: int, low_water_mark: int, refill_batch_size: int):
+        self.capacity = capacity
+        self.low_water_mark = low_water_mark
+        self.refill_batch_size = refill_batch_size
+        self.hits = 0
+        self.misses = 0
+        self._queues: dict[typing.Optional[int], collections.deque[Fact]] = collections.defaultdict(collections.deque)
+        self._refill_requests: typing.Optional[asyncio.Queue] = None
+        self._requested_keys: set[typing.Optional[int]] = set()
+        self._task: typing.Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start refilling in background, queues are filled for all known categories at first"""
+        self._refill_requests = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        for key in [self.RANDOM_FACTS, *await Category.get_all_available_categories_ids()]:
+            self._request_refill(key)
+
+    async def stop(self):
+        """Stop background refilling"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def pop(self, category_id: typing.Optional[int] = RANDOM_FACTS) -> typing.Optional[Fact]:
+        """Get ready fact of category or random one if category isn't passed, None if queue is empty"""
+        queue = self._queues[category_id]
+        fact = queue.popleft() if queue else None
+        if fact is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if len(queue) < self.low_water_mark:
+            self._request_refill(category_id)
+        return fact
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'ready_facts': sum(len(queue) for queue in self._queues.values()),
+        }
+
+    def _request_refill(self, key: typing.Optional[int]):
+        if self._task is None or key in self._requested_keys:
+            return
+        self._requested_keys.add(key)
+        self._refill_requests.put_nowait(key)
+
+    async def _run(self):
+        while True:
+            key = await self._refill_requests.get()
+            try:
+                await self._refill(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.exception(f'Facts pool refilling failed for category {key}: {error!r}')
+            finally:
+                self._requested_keys.discard(key)
+
+    async def _refill(self, key: typing.Optional[int]):
+        queue = self._queues[key]
+        while len(queue) < self.capacity:
+            amount = min(self.refill_batch_size, self.capacity - len(queue))
+            if key is self.RANDOM_FACTS:
+                facts = await self._produce_random_facts(amount)
+            else:
+                facts = await self._produce_category_facts(key, amount)
+            if not facts:
+                return
+            queue.extend(facts[:self.capacity - len(queue)])
+
+    @staticmethod
+    async def _produce_random_facts(amount: int) -> list[Fact]:
+        searcher = WikiSearcher(action='query', format='json')
+        descriptions = await searcher.get_random_wiki_facts(amount)
+        return [Fact(title, description) for title, description in descriptions.items() if description]
+
+    @staticmethod
+    async def _produce_category_facts(category_id: int, amount: int) -> list[Fact]:
+        titles = {}
+        for _ in range(amount):
+            title = await Title.get_random_title_by_category(category_id)
+            if title is None:
+                return []
+            titles[title.id] = title
+        searcher = WikiSearcher(action='query', format='json')
+        descriptions = await searcher.get_objects_wiki_info(
+            title.title_name for title in titles.values() if not title.extract
+        )
+        facts = []
+        for title in titles.values():
+            description = title.extract or descriptions.get(title.title_name)
+            if description:
+                facts.append(Fact(title.title_name, description, title.id, title.title_type_id))
+        return facts
+
+
+fact_pool = FactPool(
+    capacity=FactPoolSettings.CAPACITY.value,
+    low_water_mark=FactPoolSettings.LOW_WATER_MARK.value,
+    refill_batch_size=FactPoolSettings.REFILL_BATCH_SIZE.value,
+)
@@ -0,0 +1,160 @@
+"""Control of requests flow to wiki api"""
+import asyncio
+import contextlib
+import time
+import typing
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls with the same key, callers share one in-flight call result"""
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced_calls = 0
+        self._in_flight: dict[typing.Hashable, asyncio.Future] = {}
+
+    async def do(self, key: typing.Hashable, function: typing.Callable[[], typing.Awaitable]) -> typing.Any:
+        """Await function result or result of the same already running call"""
+        self.calls += 1
+        call = self._in_flight.get(key)
+        if call is None:
+            call = asyncio.ensure_future(function())
+            self._in_flight[key] = call
+            call.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced_calls += 1
+        return await asyncio.shield(call)  # One caller's cancellation mustn't cancel call for others
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            'calls': self.calls,
+            'coalesced_calls': self.coalesced_calls,
+            'in_flight': len(self._in_flight),
+        }
+
+
+class UpstreamGovernor:
+    """Token bucket rate limiter with concurrency cap shared by all upstream requests"""
+
+    def __init__(self, rate: float, burst: int, max_concurrency: int):
+        self.rate = rate  # Requests per second
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.waiting = 0
+        self.acquired = 0
+        self.throttled = 0
+        self.summary_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self._tokens = float(burst)
+        self._tokens_updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._semaphore: typing.Optional[asyncio.Semaphore] = None
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> typing.AsyncIterator[None]:
+        """Wait for free concurrency slot and rate limit token to make request"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        started_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+            try:
+                await self._take_token()
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+        wait_time = time.monotonic() - started_at
+        self.acquired += 1
+        self.summary_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    def pause(self, seconds: float):
+        """Stop giving tokens for required time, upstream has asked to slow down"""
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def get_stats(self) -> dict[str, typing.Union[int, float]]:
+        return {
+            'waiting': self.waiting,
+            'acquired': self.acquired,
+            'throttled': self.throttled,
+            'avg_wait_time': self.summary_wait_time / self.acquired if self.acquired else 0.0,
+            'max_wait_time': self.max_wait_time,
+        }
+
+    async def _take_token(self):
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.burst, self._tokens + (now - self._tokens_updated_at) * self.rate)
+            self._tokens_updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """Reject calls to failing upstream for a while after several consecutive failures"""
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout  # seconds before trial call is allowed
+        self.consecutive_failures = 0
+        self.rejected_calls = 0
+        self._opened_at: typing.Optional[float] = None
+        self._trial_call_in_progress = False
+        self._last_trial = 0  # Number of last allowed trial call, 0 is used for ordinary calls
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow_request(self) -> typing.Optional[int]:
+        """Check if call can be made, return its trial number (0 for ordinary call) or None if it's rejected
+
+        Only one trial call is allowed when recovery timeout is over.
+        """
+        if self._opened_at is None:
+            return 0
+        if not self._trial_call_in_progress and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._trial_call_in_progress = True
+            self._last_trial += 1
+            return self._last_trial
+        self.rejected_calls += 1
+        return None
+
+    def release_trial(self, trial: int):
+        """Allow next trial call when trial call has ended without telling anything about upstream, e.g. cancelled
+
+        Calls started before circuit breaker was opened don't release trial call which is in progress.
+        """
+        if trial and trial == self._last_trial:
+            self._trial_call_in_progress = False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._trial_call_in_progress = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_call_in_progress = False
+        if self.consecutive_failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+    def get_stats(self) -> dict[str, typing.Union[bool, int]]:
+        return {
+            'open': self.is_open,
+            'consecutive_failures': self.consecutive_failures,
+            'rejected_calls': self.rejected_calls,
+        }
@@ -0,0 +1,93 @@
+"""Incremental parsing of json documents read by chunks"""
+import codecs
+import json
+import typing
+
+WHITESPACE = ' \t\n\r'
+
+
+class JsonStreamReader:
+    """Pull parser reading json values from stream of bytes chunks, only unread part of document is kept in memory"""
+
+    def __init__(self, chunks: typing.AsyncIterable[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._finished = False
+
+    async def read_value(self) -> typing.Any:
+        """Read next whole json value"""
+        await self._peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if not await self._fill():
+                    raise
+                continue
+            if end == len(self._buffer) and await self._fill():
+                continue  # Number at the end of buffer could be cut by chunk border
+            self._position = end
+            return value
+
+    async def iterate_object(self) -> typing.AsyncIterator[str]:
+        """Iterate over keys of next object, value of every key has to be read before getting the next key"""
+        await self._expect('{')
+        if await self._peek() == '}':
+            self._position += 1
+            return
+        while True:
+            key = await self.read_value()
+            if not isinstance(key, str):
+                raise ValueError(f'Object key is expected, got {key!r}')
+            await self._expect(':')
+            yield key
+            if await self._peek() == ',':
+                self._position += 1
+                continue
+            await self._expect('}')
+            return
+
+    async def iterate_array(self) -> typing.AsyncIterator[typing.Any]:
+        """Iterate over items of next array reading them one by one"""
+        await self._expect('[')
+        if await self._peek() == ']':
+            self._position += 1
+            return
+        while True:
+            yield await self.read_value()
+            if await self._peek() == ',':
+                self._position += 1
+                continue
+            await self._expect(']')
+            return
+
+    async def _expect(self, char: str):
+        if await self._peek() != char:
+            raise ValueError(f'{char!r} is expected in json stream')
+        self._position += 1
+
+    async def _peek(self) -> str:
+        """Skip whitespaces and get next char without consuming it"""
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in WHITESPACE:
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not await self._fill():
+                raise ValueError('Unexpected end of json stream')
+
+    async def _fill(self) -> bool:
+        """Read next chunk into buffer dropping already parsed part, False if stream is over"""
+        if self._finished:
+            return False
+        try:
+            text = self._text_decoder.decode(await self._chunks.__anext__())
+        except StopAsyncIteration:
+            self._finished = True
+            text = self._text_decoder.decode(b'', final=True)
+        self._buffer = self._buffer[self._position:] + text
+        self._position = 0
+        return True
@@ -0,0 +1,89 @@
+import asyncio
+import datetime
+import typing
+
+from loguru import logger
+
+from database.models import Title, connect_to_db
+from shared.constants import ExtractPrefetchSettings
+from shared.project_settings import settings
+from wiki_searcher.searcher import WikiSearcher
+
+
+class ExtractPrefetcher:
+    """Background worker filling titles extracts in db and refreshing stale ones"""
+
+    def __init__(self, batch_size: int, refresh_period: datetime.timedelta, idle_delay: int):
+        self.batch_size = batch_size
+        self.refresh_period = refresh_period
+        self.idle_delay = idle_delay
+        self._task: typing.Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start prefetching in background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop background prefetching"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def prefetch_batch(self) -> int:
+        """Fetch extracts for one batch of titles, return amount of written extracts.
+
+        Titles which wiki can't resolve get empty extract as a mark, so they aren't selected again until refresh.
+        """
+        titles = await Title.get_titles_to_prefetch(
+            datetime.datetime.utcnow() - self.refresh_period,
+            self.batch_size,
+        )
+        if not titles:
+            return 0
+        searcher = WikiSearcher(action='query', format='json')
+        descriptions = await searcher.get_objects_wiki_info(title.title_name for title in titles)
+        extracts = {}
+        for title in titles:
+            extracts[title.id] = descriptions.get(title.title_name, '')
+            if not extracts[title.id]:
+                logger.warning(f'Failed to prefetch extract for title: {title.title_name}')
+        await Title.update_extracts(extracts)
+        logger.debug(f'Prefetched {sum(map(bool, extracts.values()))} of {len(titles)} extracts')
+        return len(extracts)
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.prefetch_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.exception(f'Extracts prefetching failed: {error!r}')
+                processed = 0
+            if processed < self.batch_size:
+                await asyncio.sleep(self.idle_delay)
+
+
+extract_prefetcher = ExtractPrefetcher(
+    batch_size=ExtractPrefetchSettings.BATCH_SIZE.value,
+    refresh_period=datetime.timedelta(days=ExtractPrefetchSettings.REFRESH_PERIOD_DAYS.value),
+    idle_delay=ExtractPrefetchSettings.IDLE_DELAY.value,
+)
+
+
+async def process_extracts_filling():
+    """Fill all missing and stale extracts at once"""
+    await connect_to_db(settings.create_db_uri())
+    while await extract_prefetcher.prefetch_batch():
+        pass
+    await WikiSearcher.close_session()
+
+
+if __name__ == '__main__':
+    asyncio.run(process_extracts_filling())
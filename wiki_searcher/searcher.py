@@ -1,16 +1,33 @@
 import asyncio
 import typing
 
+import aiohttp
+
 from database.models import Title, Category, connect_to_db
-from wiki_searcher.utilities import process_searching
+from wiki_searcher.cache import extract_cache
+from wiki_searcher.utilities import (
+    process_searching,
+    create_client_session,
+    process_extracts_searching,
+    stream_category_members,
+    process_random_facts_searching,
+)
 from shared.project_settings import settings
 from shared.utilities import get_all_enum_values
-from shared.constants import SearchedObjectTypes, SearchedObjectCategories
+from shared.constants import (
+    SearchedObjectTypes,
+    SearchedObjectCategories,
+    WikiApiLimits,
+    WikiNamespace,
+    CategoryCrawlSettings,
+)
 
 
 class WikiSearcher:
     """Class for processing searching actions on wikipedia"""
 
+    _session: typing.Optional[aiohttp.ClientSession] = None  # Shared by all searchers to reuse connections
+
     def __init__(self, action: str, format: str, **kwargs: dict[str]):
         self.main_search_settings = {
             'action': action,
@@ -25,20 +42,74 @@ class WikiSearcher:
             except KeyError:
                 print('Wrong arguments, requires keys: prop, title')
 
+    @classmethod
+    async def start_session(cls) -> aiohttp.ClientSession:
+        """Get shared http session, create it if it isn't opened yet"""
+        if cls._session is None or cls._session.closed:
+            cls._session = create_client_session()
+        return cls._session
+
+    @classmethod
+    async def close_session(cls):
+        """Close shared http session"""
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+        cls._session = None
+
     async def get_object_wiki_info(self, title: str) -> str:
-        """Get info about specific object"""
+        """Get info about specific object, empty string if it's missing"""
+        cached_description = await extract_cache.get(title)
+        if cached_description:
+            return cached_description
+        search_settings = self._create_extracts_search_settings([title])
+        object_description = await process_searching(
+            await self.start_session(),
+            search_settings,
+        )
+        if object_description:  # Missing page isn't cached, it could be created later
+            await extract_cache.set(title, object_description)
+        return object_description
+
+    async def get_objects_wiki_info(self, titles: typing.Iterable[str]) -> dict[str, str]:
+        """Get info about several objects by their titles using as few requests as possible"""
+        result = {}
+        titles_to_search = []
+        for title in dict.fromkeys(titles):
+            cached_description = await extract_cache.get(title)
+            if cached_description:
+                result[title] = cached_description
+            else:
+                titles_to_search.append(title)
+        chunk_size = WikiApiLimits.EXTRACTS_PER_REQUEST.value
+        session = await self.start_session()
+        searched_chunks = await asyncio.gather(
+            *(
+                process_extracts_searching(
+                    session,
+                    self._create_extracts_search_settings(titles_to_search[index:index + chunk_size]),
+                )
+                for index in range(0, len(titles_to_search), chunk_size)
+            )
+        )
+        for descriptions in searched_chunks:
+            for title, description in descriptions.items():
+                if description:  # Missing and invalid pages aren't cached
+                    await extract_cache.set(title, description)
+                result[title] = description
+        return result
+
+    def _create_extracts_search_settings(self, titles: list[str]) -> dict[typing.Union[str, int]]:
+        """Create search settings to get extracts of required titles"""
         search_settings = self.main_search_settings.copy()
         search_settings.update(
-            titles=title,
+            titles='|'.join(titles),
             prop='extracts',
-            exlimit=1,
+            exlimit=len(titles),
             exintro=1,  # Search options for correct text representation only of main description
             explaintext=1,  # Additional info https://www.mediawiki.org/wiki/Extension:TextExtracts#API
             exectionformat='wiki',
         )
-
-        object_description = await process_searching(search_settings, SearchedObjectTypes.PAGE.value)
-        return object_description
+        return search_settings
 
     async def get_random_wiki_title(self) -> str:
         """Get random wikipedia title"""
@@ -48,40 +119,104 @@ class WikiSearcher:
             rnnamespace=0,  # Searching only for pages
             rnlimit=1,
         )
-        title = await process_searching(search_settings, SearchedObjectTypes.TITLE.value)
+        title = await process_searching(
+            await self.start_session(),
+            search_settings,
+        )
         return title
 
-    async def get_subcategories_titles(
-            self,
-            searched_object: str,
-            object_type_id: int,
-            amount_of_searched_objects: int,
-    ) -> typing.Optional[list[str]]:
-        """Get subcategories titles for required object and write them into db"""
+    async def get_random_wiki_facts(self, amount: int) -> dict[str, str]:
+        """Get random wikipedia pages with their info by one request, pages without intro are left out"""
+        amount = min(amount, WikiApiLimits.EXTRACTS_PER_REQUEST.value)
         search_settings = self.main_search_settings.copy()
         search_settings.update(
-            list=SearchedObjectTypes.CATEGORY_MEMBERS.value,
-            cmtitle=searched_object,
-            cmtype=SearchedObjectTypes.PAGE.value + '|' + SearchedObjectTypes.SUBCATEGORY.value,
-            cmlimit=amount_of_searched_objects,
+            generator='random',
+            grnnamespace=0,  # Searching only for pages
+            grnlimit=amount,
+            prop='extracts',
+            exlimit=amount,
+            exintro=1,
+            explaintext=1,
         )
-        titles, categories = await process_searching(
+        facts = await process_random_facts_searching(
+            await self.start_session(),
             search_settings,
-            SearchedObjectTypes.CATEGORY_MEMBERS.value,
         )
-        if not titles and not categories:
-            return None
-        tasks = []
-        for title in titles:
-            tasks.append(Title.create(title_name=title, title_type_id=object_type_id))
-        await asyncio.gather(*tasks)
-        return categories
+        facts = {title: description for title, description in facts.items() if description}
+        for title, description in facts.items():
+            await extract_cache.set(title, description)
+        return facts
+
+    async def get_category_members(self, category: str) -> typing.AsyncIterator[tuple[int, str]]:
+        """Get (namespace, title) of all category pages and subcategories following continuation tokens"""
+        search_settings = self.main_search_settings.copy()
+        search_settings.update(
+            list=SearchedObjectTypes.CATEGORY_MEMBERS.value,
+            cmtitle=category,
+            cmtype=SearchedObjectTypes.PAGE.value + '|' + SearchedObjectTypes.SUBCATEGORY.value,
+            cmlimit='max',
+        )
+        continuation = {}
+        while True:
+            next_continuation = {}
+            async for member in stream_category_members(
+                    await self.start_session(),
+                    {**search_settings, **continuation},
+                    next_continuation,
+            ):
+                yield member
+            if not next_continuation:
+                return
+            continuation = next_continuation
+
+    async def crawl_category_members(
+            self,
+            root_category: str,
+            max_depth: int,
+    ) -> typing.AsyncIterator[tuple[int, str]]:
+        """Breadth-first crawl over category tree yielding (namespace, title) of its pages"""
+        visited_categories = {root_category}
+        current_level = [root_category]
+        for depth in range(max_depth + 1):
+            next_level = []
+            for category in current_level:
+                async for namespace, title in self.get_category_members(category):
+                    if namespace != WikiNamespace.CATEGORY.value:
+                        yield namespace, title
+                    elif depth < max_depth and title not in visited_categories:
+                        visited_categories.add(title)
+                        next_level.append(title)
+            if not next_level:
+                return
+            current_level = next_level
+
+
+async def fill_category_titles(
+        searcher: WikiSearcher,
+        category: str,
+        category_id: int,
+        max_depth: int,
+        batch_size: int,
+) -> int:
+    """Crawl category tree and write its pages titles into db by batches, return amount of new titles"""
+    amount_of_titles = 0
+    titles = []
+    async for _, title in searcher.crawl_category_members(category, max_depth):
+        if len(title) > Title.title_name.type.length:
+            continue
+        titles.append(title)
+        if len(titles) >= batch_size:
+            amount_of_titles += await Title.create_titles(category_id, titles)
+            titles = []
+    amount_of_titles += await Title.create_titles(category_id, titles)
+    return amount_of_titles
 
 
 async def process_titles_filling(
         searched_categories: list[str],
-        amount_of_objects_for_level: int = 5000,
-) -> tuple:
+        max_depth: int = CategoryCrawlSettings.MAX_DEPTH.value,
+        batch_size: int = CategoryCrawlSettings.TITLES_BATCH_SIZE.value,
+) -> list[int]:
     await connect_to_db(settings.create_db_uri())
     searcher = WikiSearcher(action='query', format='json')
     tasks = []
@@ -91,15 +226,19 @@ async def process_titles_filling(
         if not existing_category:
             existing_category = await Category.create(category_name=just_category_name)
         tasks.append(
-            searcher.get_subcategories_titles(
-                searched_object=category,
-                object_type_id=existing_category.id,
-                amount_of_searched_objects=amount_of_objects_for_level,
+            fill_category_titles(
+                searcher,
+                category=category,
+                category_id=existing_category.id,
+                max_depth=max_depth,
+                batch_size=batch_size,
             )
         )
     result = await asyncio.gather(*tasks)
+    await WikiSearcher.close_session()
     return result
 
+
 if __name__ == '__main__':
     categories = get_all_enum_values(SearchedObjectCategories)
     asyncio.run(process_titles_filling(categories))
@@ -1,43 +1,254 @@
+import asyncio
+import contextlib
+import random
 import typing
 
 import aiohttp
 import ujson
+from loguru import logger
 
-from shared.constants import Wiki, SearchedObjectTypes
+from shared.constants import Wiki, WikiClientSettings, WikiThrottlingSettings, WikiResilienceSettings
+from shared.exceptions import WikiUnavailableError
+from wiki_searcher.flow_control import SingleFlight, UpstreamGovernor, CircuitBreaker
+from wiki_searcher.json_stream import JsonStreamReader
 
+THROTTLING_STATUSES = (429, 503)
+API_ERROR_HEADER = 'MediaWiki-API-Error'
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=WikiResilienceSettings.REQUEST_TIMEOUT.value)
+# Streamed response is read while its items are processed, so only waiting for every chunk is limited
+STREAM_TIMEOUT = aiohttp.ClientTimeout(
+    sock_connect=WikiResilienceSettings.REQUEST_TIMEOUT.value,
+    sock_read=WikiResilienceSettings.REQUEST_TIMEOUT.value,
+)
 
-async def process_searching(search_settings: dict[typing.Union[str, int]],
-                            task: str) -> typing.Union[str, tuple[list[str], list[str]]]:
+search_flights = SingleFlight()
+upstream_governor = UpstreamGovernor(
+    rate=WikiThrottlingSettings.RATE.value,
+    burst=WikiThrottlingSettings.BURST.value,
+    max_concurrency=WikiThrottlingSettings.MAX_CONCURRENCY.value,
+)
+circuit_breaker = CircuitBreaker(
+    failure_threshold=WikiResilienceSettings.FAILURE_THRESHOLD.value,
+    recovery_timeout=WikiResilienceSettings.RECOVERY_TIMEOUT.value,
+)
+
+
+def create_client_session() -> aiohttp.ClientSession:
+    """Create http session with bounded keep-alive connection pool for wiki api"""
+    connector = aiohttp.TCPConnector(
+        limit=WikiClientSettings.CONNECTIONS_LIMIT.value,
+        limit_per_host=WikiClientSettings.CONNECTIONS_LIMIT_PER_HOST.value,
+        ttl_dns_cache=WikiClientSettings.DNS_CACHE_TTL.value,
+        keepalive_timeout=WikiClientSettings.KEEPALIVE_TIMEOUT.value,
+    )
+    return aiohttp.ClientSession(connector=connector, json_serialize=ujson.dumps)
+
+
+async def process_searching(
+        session: aiohttp.ClientSession,
+        search_settings: dict[typing.Union[str, int]],
+) -> str:
     """Get object info from required page"""
-    async with aiohttp.ClientSession(json_serialize=ujson.dumps) as session:
-        response = await session.get(Wiki.API_URL.value, params=search_settings)
-        await session.close()
-    if task != SearchedObjectTypes.CATEGORY_MEMBERS.value:
-        return get_object_info_for_one_page(await response.json(loads=ujson.loads))
-    return get_titles_and_categories(await response.json(loads=ujson.loads))
+    data = await fetch_json(session, search_settings)
+    return get_object_info_for_one_page(data)
+
+
+async def process_random_facts_searching(
+        session: aiohttp.ClientSession,
+        search_settings: dict[typing.Union[str, int]],
+) -> dict[str, str]:
+    """Get random pages extracts by titles, continuation isn't followed since it leads to other random pages"""
+    data = await fetch_json(session, search_settings)
+    return get_extracts_for_pages(data.get('query', {}).get('pages', {}), {})
+
+
+async def stream_category_members(
+        session: aiohttp.ClientSession,
+        search_settings: dict[typing.Union[str, int]],
+        continuation: dict[str],
+) -> typing.AsyncIterator[tuple[int, str]]:
+    """Get (namespace, title) of category members while response is downloaded, fill continuation for the next page.
+
+    Request is retried only until the first member is got, later failures are raised as WikiUnavailableError.
+    """
+    trial = circuit_breaker.allow_request()
+    if trial is None:
+        raise WikiUnavailableError('too many failed requests, circuit breaker is open')
+    try:
+        max_attempts = WikiResilienceSettings.MAX_ATTEMPTS.value
+        for attempt in range(1, max_attempts + 1):
+            members_are_got = False
+            try:
+                async with open_response(session, search_settings, STREAM_TIMEOUT) as response:
+                    chunks = response.content.iter_chunked(WikiClientSettings.STREAM_CHUNK_SIZE.value)
+                    async for member in parse_category_members(JsonStreamReader(chunks), continuation):
+                        members_are_got = True
+                        yield member
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as error:  # ValueError is for broken json
+                logger.warning(f'Wiki api category members streaming failed, attempt {attempt}: {error!r}')
+                if members_are_got or attempt == max_attempts:
+                    circuit_breaker.record_failure()
+                    raise WikiUnavailableError(repr(error)) from error
+            except WikiUnavailableError:
+                circuit_breaker.record_failure()
+                raise
+            else:
+                circuit_breaker.record_success()
+                return
+            continuation.clear()
+            await asyncio.sleep(get_retry_delay(attempt))
+    except BaseException:
+        circuit_breaker.release_trial(trial)  # Streaming is cancelled, stopped by consumer or failed on our side
+        raise
+
+
+async def process_extracts_searching(
+        session: aiohttp.ClientSession,
+        search_settings: dict[typing.Union[str, int]],
+) -> dict[str, str]:
+    """Get extracts of all titles required in search settings following continuation tokens"""
+    extracts = {}
+    normalized_titles = {}
+    continuation = {}
+    while True:
+        data = await fetch_json(session, {**search_settings, **continuation})
+        query = data.get('query', {})
+        for normalization in query.get('normalized', []):
+            normalized_titles[normalization['to']] = normalization['from']
+        extracts.update(get_extracts_for_pages(query.get('pages', {}), normalized_titles))
+        if 'continue' not in data:
+            return extracts
+        continuation = data['continue']
+
+
+async def fetch_json(session: aiohttp.ClientSession, search_settings: dict[typing.Union[str, int]]) -> dict:
+    """Make request to wiki api and get decoded json, identical concurrent requests are made once"""
+    if is_random_search(search_settings):  # Every such request has to return its own random pages
+        return await _fetch_json(session, search_settings)
+    return await search_flights.do(
+        tuple(sorted(search_settings.items())),
+        lambda: _fetch_json(session, search_settings),
+    )
+
+
+async def _fetch_json(session: aiohttp.ClientSession, search_settings: dict[typing.Union[str, int]]) -> dict:
+    """Make request with retries, fail fast without request while circuit breaker is open"""
+    trial = circuit_breaker.allow_request()
+    if trial is None:
+        raise WikiUnavailableError('too many failed requests, circuit breaker is open')
+    try:
+        data = await asyncio.wait_for(
+            _fetch_json_with_retries(session, search_settings),
+            WikiResilienceSettings.CALL_DEADLINE.value,
+        )
+    except WikiUnavailableError:
+        circuit_breaker.record_failure()
+        raise
+    except asyncio.TimeoutError as error:  # Timeouts of attempts are handled inside, so whole call is too long
+        circuit_breaker.record_failure()
+        raise WikiUnavailableError('wiki api call deadline is exceeded') from error
+    except BaseException:
+        circuit_breaker.release_trial(trial)  # Call is cancelled or failed on our side
+        raise
+    circuit_breaker.record_success()
+    return data
+
+
+async def _fetch_json_with_retries(
+        session: aiohttp.ClientSession,
+        search_settings: dict[typing.Union[str, int]],
+) -> dict:
+    """Make idempotent GET request retrying failed attempts with jittered exponential backoff"""
+    max_attempts = WikiResilienceSettings.MAX_ATTEMPTS.value
+    for attempt in range(1, max_attempts + 1):
+        try:
+            async with open_response(session, search_settings, REQUEST_TIMEOUT) as response:
+                return await response.json(loads=ujson.loads)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as error:  # ValueError is for broken json
+            logger.warning(f'Wiki api request failed, attempt {attempt}: {error!r}')
+            if attempt == max_attempts:
+                raise WikiUnavailableError(repr(error)) from error
+        await asyncio.sleep(get_retry_delay(attempt))
+
+
+@contextlib.asynccontextmanager
+async def open_response(
+        session: aiohttp.ClientSession,
+        search_settings: dict[typing.Union[str, int]],
+        timeout: aiohttp.ClientTimeout,
+) -> typing.AsyncIterator[aiohttp.ClientResponse]:
+    """Get successful response to read, wait and try again while wiki api asks to slow down"""
+    search_settings = {**search_settings, 'maxlag': WikiThrottlingSettings.MAXLAG.value}
+    for attempt in range(1, WikiThrottlingSettings.MAX_ATTEMPTS.value + 1):
+        async with upstream_governor.slot():
+            async with session.get(Wiki.API_URL.value, params=search_settings, timeout=timeout) as response:
+                if response.status not in THROTTLING_STATUSES and response.headers.get(API_ERROR_HEADER) != 'maxlag':
+                    response.raise_for_status()
+                    yield response
+                    return
+                retry_after = get_retry_after(response)
+        logger.warning(f'Wiki api asked to retry after {retry_after} seconds, attempt {attempt}')
+        upstream_governor.pause(retry_after)
+    raise WikiUnavailableError('wiki api keeps asking to slow down')
+
+
+def get_retry_delay(attempt: int) -> float:
+    """Get jittered exponential delay before the next attempt"""
+    return WikiResilienceSettings.RETRY_DELAY.value * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+
+
+def get_retry_after(response: aiohttp.ClientResponse) -> float:
+    """Get seconds to wait before next request from Retry-After header"""
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return WikiThrottlingSettings.DEFAULT_RETRY_AFTER.value
+
+
+def is_random_search(search_settings: dict[typing.Union[str, int]]) -> bool:
+    return search_settings.get('list') == 'random' or search_settings.get('generator') == 'random'
+
+
+def get_extracts_for_pages(pages: dict[str, dict], normalized_titles: dict[str, str]) -> dict[str, str]:
+    """Parse pages info into extracts by requested titles, missing pages get empty extract"""
+    extracts = {}
+    for page in pages.values():
+        if 'extract' not in page and 'missing' not in page and 'invalid' not in page:
+            continue  # Extract of this page will be returned after continuation
+        title = normalized_titles.get(page['title'], page['title'])
+        extracts[title] = page.get('extract', '')
+    return extracts
 
 
 def get_object_info_for_one_page(data: dict[str]) -> str:
     """Parse json file to get reqired page's title or info"""
-    result = data['query'].setdefault('pages')
+    result = data['query'].get('pages')  # Data mustn't be changed since it can be shared by coalesced calls
     if result:
         pages_info = list(data['query']['pages'].values())
-        object_description = pages_info[0]['extract']  # only 1 value represents because we look for 1 title
+        object_description = pages_info[0].get('extract', '')  # only 1 value represents because we look for 1 title
         return object_description
     object_info = data['query']['random'][0]  # same because we get 1 random page
     title = object_info['title']
     return title
 
 
-def get_titles_and_categories(data: dict[str]) -> typing.Union[tuple[list[str], list[str]], tuple[None, None]]:
-    """Parse json file for categories or pages titles to insert into db """
-    titles = []
-    categories = []
-    if 'categorymembers' not in data['query'].keys():
-        return None, None
-    search_results = data['query']['category_members']
-    for result in search_results:
-        if result['ns'] == 0:  # Means that result is page other is category
-            titles.append(result['title'])
-        categories.append(result['title'])
-    return titles, categories
+async def parse_category_members(
+        reader: JsonStreamReader,
+        continuation: dict[str],
+) -> typing.AsyncIterator[tuple[int, str]]:
+    """Parse streamed json for (namespace, title) of category pages and subcategories and continuation settings"""
+    async for key in reader.iterate_object():
+        if key == 'query':
+            async for query_key in reader.iterate_object():
+                if query_key != 'categorymembers':
+                    await reader.read_value()
+                    continue
+                async for member in reader.iterate_array():
+                    yield member['ns'], member['title']
+        elif key == 'continue':
+            continuation.update(await reader.read_value())
+        elif key == 'error':
+            error = await reader.read_value()
+            raise WikiUnavailableError(f'wiki api error {error.get("code")}: {error.get("info")}')
+        else:
+            await reader.read_value()